@@ -0,0 +1,21 @@
+"""Gunicorn settings, picked up when gunicorn is started from the repository root.
+
+/api/events/stream keeps one request open per connected screen. On sync
+workers every stream would pin a whole worker, and gunicorn kills it at the
+worker timeout, so requests run in threads (gthread): a stream only occupies
+one thread, and the worker's heartbeat does not wait for it to finish.
+
+The event broker is in-process, so a stream only sees events published by its
+own worker. Keep a single worker (the default here), or serve /api/events from
+a dedicated single-worker process behind the proxy and scale the rest of the
+API with GUNICORN_WORKERS.
+"""
+import os
+
+wsgi_app = 'src.main:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+# Concurrent requests per worker, open event streams included
+threads = int(os.environ.get('GUNICORN_THREADS', 64))
+timeout = 30
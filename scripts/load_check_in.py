@@ -0,0 +1,120 @@
+"""Concurrent check-in load test.
+
+Serves the app from a threaded server on a throwaway SQLite database, has
+every staff member tap check-in several times at once, and checks that each
+(staff_id, shift_date) ended up with exactly one entry. Prints the status
+codes and latency percentiles; exits non-zero on duplicates, server errors,
+or a p99 above --max-p99-ms.
+
+    python scripts/load_check_in.py --staff 400 --taps 2 --threads 64
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--staff', type=int, default=400, help='Staff members checking in')
+    parser.add_argument('--taps', type=int, default=2, help='Check-in requests per staff member')
+    parser.add_argument('--threads', type=int, default=64, help='Concurrent clients')
+    parser.add_argument('--max-p99-ms', type=float, default=None, help='Fail if p99 latency exceeds this')
+    return parser.parse_args()
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='load_check_in_')
+    # Must be set before the app is imported; timeout is SQLite's busy wait in seconds
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(workdir, "load.db")}?timeout=30'
+    sys.path.insert(0, ROOT)
+
+    import logging
+    from werkzeug.serving import make_server
+    from src.main import app
+    from src.models.user import User, db
+    from src.models.workforce import WorkforceEntry
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    with app.app_context():
+        db.session.execute(db.insert(User), [{
+            'staff_number': f'LOAD{n}', 'name': f'Load Test {n}', 'email': f'load{n}@example.com',
+            'role': 'Staff', 'department': 'Operations', 'password_hash': 'x'
+        } for n in range(args.staff)])
+        db.session.commit()
+        staff_ids = [row.id for row in db.session.query(User.id).filter(User.staff_number.like('LOAD%'))]
+
+    # Signed session cookies, so the test measures check-in rather than password hashing
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookies = {staff_id: serializer.dumps({'user_id': staff_id, 'user_role': 'Staff'}) for staff_id in staff_ids}
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/api/workforce/check-in'
+
+    def check_in(staff_id):
+        request = urllib.request.Request(
+            url, method='POST', data=json.dumps({'gps_coordinates': '-1.2864,36.8172'}).encode(),
+            headers={'Content-Type': 'application/json', 'Cookie': f'session={cookies[staff_id]}'}
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return status, (time.perf_counter() - start) * 1000
+
+    # Each staff member's taps are spread through the run, interleaved with everyone else's
+    jobs = [staff_id for _ in range(args.taps) for staff_id in staff_ids]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(check_in, jobs))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in results)
+    with app.app_context():
+        per_shift = db.select(WorkforceEntry.staff_id, db.func.count().label('entries')).where(
+            WorkforceEntry.staff_id.in_(staff_ids)
+        ).group_by(WorkforceEntry.staff_id, WorkforceEntry.shift_date).subquery()
+        shifts, rows = db.session.execute(
+            db.select(db.func.count(), db.func.coalesce(db.func.sum(per_shift.c.entries), 0))
+        ).one()
+    duplicates = rows - shifts
+    p99 = percentile(latencies, 0.99)
+
+    print(f'{len(jobs)} check-ins from {args.threads} threads in {elapsed:.1f}s, statuses={statuses}')
+    print(f'entries={rows} shifts={shifts} duplicates={duplicates}')
+    print(f'latency p50={percentile(latencies, 0.5):.0f}ms p95={percentile(latencies, 0.95):.0f}ms '
+          f'p99={p99:.0f}ms max={latencies[-1]:.0f}ms')
+
+    failures = []
+    if duplicates:
+        failures.append(f'{duplicates} duplicate entries')
+    if shifts != len(staff_ids):
+        failures.append(f'{len(staff_ids) - shifts} staff without an entry')
+    if any(status >= 500 for status in statuses):
+        failures.append('server errors')
+    if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+        failures.append(f'p99 {p99:.0f}ms above {args.max_p99_ms:.0f}ms')
+    if failures:
+        print('FAILED: ' + ', '.join(failures))
+        return 1
+    print('OK')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
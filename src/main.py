@@ -3,6 +3,8 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import click
+from datetime import timedelta
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
@@ -10,6 +12,12 @@ from src.routes.auth import auth_bp
 from src.routes.complaints import complaints_bp
 from src.routes.workforce import workforce_bp
 from src.routes.reports import reports_bp
+from src.routes.events import events_bp
+from src.utils.ratelimit import limiter
+from src.utils.search import install_search_index
+from src.utils.schema import backfill_minutes_worked, upgrade_database
+from src.models.complaint_rollup import rebuild_rollup_days
+from src.utils.sla import init_sweeper, run_sweeper, sweep_overdue_complaints
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'kplc-field-workforce-management-2025'
@@ -26,14 +34,26 @@ app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(complaints_bp, url_prefix='/api/complaints')
 app.register_blueprint(workforce_bp, url_prefix='/api/workforce')
 app.register_blueprint(reports_bp, url_prefix='/api/reports')
+app.register_blueprint(events_bp, url_prefix='/api/events')
 
 # Database configuration
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("SQLALCHEMY_DATABASE_URI", "sqlite:///database/app.db")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Complaint numbers each worker reserves at a time (1 keeps IDs strictly in order)
+app.config['COMPLAINT_ID_BLOCK_SIZE'] = int(os.environ.get('COMPLAINT_ID_BLOCK_SIZE', 1))
+# Content-addressed attachment storage
+app.config['ATTACHMENT_STORAGE_PATH'] = os.environ.get(
+    'ATTACHMENT_STORAGE_PATH', os.path.join(app.instance_path, 'attachments')
+)
+app.config['ATTACHMENT_MAX_BYTES'] = int(os.environ.get('ATTACHMENT_MAX_BYTES', 25 * 1024 * 1024))
+# Rate limits are shared across workers when this points at Redis (redis://...)
+app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('RATELIMIT_STORAGE_URL')
 db.init_app(app)
+limiter.init_app(app)
 
 with app.app_context():
     db.create_all()
+    install_search_index(db.engine)
     
     # Seed initial data
     from src.models.user import User
@@ -63,6 +83,52 @@ with app.app_context():
         
         db.session.commit()
 
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Add new columns and indexes to an existing database"""
+    messages = upgrade_database()
+    for message in messages:
+        click.echo(message)
+    if not messages:
+        click.echo('Database is up to date')
+
+@app.cli.command('rebuild-rollup')
+@click.option('--start', 'start_date', type=click.DateTime(formats=['%Y-%m-%d']), help='First day to rebuild')
+@click.option('--end', 'end_date', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day to rebuild')
+def rebuild_rollup_command(start_date, end_date):
+    """Recompute complaint_daily_rollup from the complaints table"""
+    days = None
+    if start_date or end_date:
+        if not (start_date and end_date):
+            raise click.UsageError('--start and --end must be given together')
+        days = [start_date.date() + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+    
+    with db.engine.begin() as conn:
+        rebuild_rollup_days(conn, days)
+    click.echo('Rebuilt all days' if days is None else f'Rebuilt {len(days)} day(s)')
+
+@app.cli.command('backfill-minutes-worked')
+def backfill_minutes_worked_command():
+    """Store minutes_worked for completed shifts that do not have it yet"""
+    with db.engine.begin() as conn:
+        updated = backfill_minutes_worked(conn)
+    click.echo(f'Stored minutes_worked for {updated} shift(s)')
+
+@app.cli.command('sla-sweep')
+@click.option('--loop', is_flag=True, help='Keep sweeping instead of running once')
+@click.option('--interval', default=300, show_default=True, help='Seconds between sweeps with --loop')
+def sla_sweep_command(loop, interval):
+    """Escalate complaints that have been open past the SLA"""
+    if loop:
+        run_sweeper(app, interval)
+    else:
+        click.echo(f'Escalated {sweep_overdue_complaints()} overdue complaint(s)')
+
+# Sweep in-process by default so /overdue stays current; concurrent sweeps
+# are safe, but with many workers set 0 and run one 'flask sla-sweep --loop'
+app.config['SLA_SWEEPER_INTERVAL'] = int(os.environ.get('SLA_SWEEPER_INTERVAL', 300))
+init_sweeper(app)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -0,0 +1,30 @@
+from src.models.user import db
+from datetime import datetime
+
+class Attachment(db.Model):
+    """A file attached to a complaint; the bytes live in content-addressed storage"""
+    __tablename__ = 'attachments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    complaint_id = db.Column(db.Integer, db.ForeignKey('complaints.id'), nullable=False, index=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)  # Storage key, shared by duplicates
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False, default='application/octet-stream')
+    size = db.Column(db.BigInteger, nullable=False)
+    uploaded_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    complaint = db.relationship('Complaint', back_populates='attachment_files')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'sha256': self.sha256,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Attachment {self.filename} ({self.sha256[:12]})>'
@@ -1,9 +1,31 @@
-from src.models.user import db
+from src.models.user import User, db
+from src.utils.geo import gps_columns
 from datetime import datetime
 import json
 
 class Complaint(db.Model):
     __tablename__ = 'complaints'
+    __table_args__ = (
+        # Dashboard/stats counts and list filters
+        db.Index('ix_complaints_status_priority', 'status', 'priority'),
+        # Overdue scan: open, not escalated, older than the SLA cutoff
+        db.Index('ix_complaints_status_escalation_created', 'status', 'escalation_level', 'created_at'),
+        # Default list ordering and date-range reports
+        db.Index('ix_complaints_created_at', 'created_at'),
+        # max(updated_at) for list ETags
+        db.Index('ix_complaints_updated_at', 'updated_at'),
+        db.Index('ix_complaints_resolved_at', 'resolved_at'),
+        # Staff performance report
+        db.Index('ix_complaints_assigned_created', 'assigned_to_id', 'created_at'),
+        # Complaints already flagged by the SLA sweeper
+        db.Index('ix_complaints_overdue_at', 'overdue_at'),
+        # Nearby search: grid cell lookup, or a latitude range for large radii
+        db.Index('ix_complaints_geo_cell', 'geo_cell'),
+        db.Index('ix_complaints_latitude', 'latitude'),
+        # Duplicate detection: recent complaints with the same fingerprint
+        db.Index('ix_complaints_fingerprint_created', 'fingerprint', 'created_at'),
+        db.Index('ix_complaints_duplicate_of', 'duplicate_of_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     complaint_id = db.Column(db.String(20), unique=True, nullable=False)  # e.g., 2025-0001
@@ -12,76 +34,111 @@ class Complaint(db.Model):
     customer_email = db.Column(db.String(120), nullable=True)
     issue_type = db.Column(db.String(100), nullable=False)  # Faulty Meter, Illegal Connection, etc.
     description = db.Column(db.Text, nullable=False)
-    status = db.Column(db.String(50), nullable=False, default='Open')  # Open, In Progress, Resolved, Closed
+    status = db.Column(db.String(50), nullable=False, default='Open')  # Open, In Progress, Resolved, Closed, Duplicate
     priority = db.Column(db.String(20), nullable=False, default='Medium')  # Low, Medium, High, Critical
     location = db.Column(db.String(200), nullable=True)
     gps_coordinates = db.Column(db.String(50), nullable=True)
+    # Parsed from gps_coordinates for location queries
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geo_cell = db.Column(db.String(20), nullable=True)  # 0.1 degree grid cell, see src.utils.geo
     
     # Relationships
     created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     assigned_to_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    creator = db.relationship('User', foreign_keys=[created_by_id])
+    assignee = db.relationship('User', foreign_keys=[assigned_to_id])
+    attachment_files = db.relationship('Attachment', back_populates='complaint', order_by='Attachment.id')
+    
+    # Duplicate detection, see src.utils.duplicates
+    fingerprint = db.Column(db.String(40), nullable=True)  # phone + issue type + grid cell
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('complaints.id'), nullable=True)
     
     # Escalation tracking
     escalation_level = db.Column(db.Integer, default=0)  # 0=None, 1=Supervisor, 2=Manager
     escalated_at = db.Column(db.DateTime, nullable=True)
+    overdue_at = db.Column(db.DateTime, nullable=True)  # Set by the SLA sweeper
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     resolved_at = db.Column(db.DateTime, nullable=True)
     
-    # File attachments (stored as JSON array of file paths)
+    # Legacy file attachments (stored as JSON array of file paths);
+    # uploaded files are Attachment rows, see attachment_files
     attachments = db.Column(db.Text, nullable=True)  # JSON array of file paths
     
     # Customer feedback
     customer_satisfaction = db.Column(db.Integer, nullable=True)  # 1-5 rating
     customer_feedback = db.Column(db.Text, nullable=True)
     
+    @db.validates('gps_coordinates')
+    def _parse_gps_coordinates(self, key, value):
+        for column, parsed in gps_columns(value).items():
+            setattr(self, column, parsed)
+        return value
+    
     def set_attachments(self, file_paths):
         self.attachments = json.dumps(file_paths) if file_paths else None
     
     def get_attachments(self):
         return json.loads(self.attachments) if self.attachments else []
     
-    def to_dict(self):
-        # Get creator and assignee names safely
-        creator_name = None
-        assignee_name = None
-        
-        if self.created_by_id:
-            from src.models.user import User
-            creator = User.query.get(self.created_by_id)
-            creator_name = creator.name if creator else None
-            
-        if self.assigned_to_id:
-            from src.models.user import User
-            assignee = User.query.get(self.assigned_to_id)
-            assignee_name = assignee.name if assignee else None
-        
-        return {
-            'id': self.id,
-            'complaint_id': self.complaint_id,
-            'customer_name': self.customer_name,
-            'customer_phone': self.customer_phone,
-            'customer_email': self.customer_email,
-            'issue_type': self.issue_type,
-            'description': self.description,
-            'status': self.status,
-            'priority': self.priority,
-            'location': self.location,
-            'gps_coordinates': self.gps_coordinates,
-            'created_by': creator_name,
-            'assigned_to': assignee_name,
-            'escalation_level': self.escalation_level,
-            'escalated_at': self.escalated_at.isoformat() if self.escalated_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
-            'attachments': self.get_attachments(),
-            'customer_satisfaction': self.customer_satisfaction,
-            'customer_feedback': self.customer_feedback
-        }
+    @classmethod
+    def with_people(cls, query, fields=None, extra_columns=()):
+        """Load only what to_dict(fields) renders, with creator and assignee
+        names joined in so to_dict() never queries per row"""
+        options = []
+        if fields:
+            columns = {'id'} | {column for field in fields for column in COMPLAINT_FIELDS[field][0]}
+            columns.update(extra_columns)
+            options.append(db.load_only(*[getattr(cls, column) for column in columns]))
+        if not fields or 'created_by' in fields:
+            options.append(db.joinedload(cls.creator).load_only(User.name))
+        if not fields or 'assigned_to' in fields:
+            options.append(db.joinedload(cls.assignee).load_only(User.name))
+        if not fields or 'attachment_files' in fields:
+            options.append(db.selectinload(cls.attachment_files))
+        return query.options(*options)
+    
+    def to_dict(self, fields=None):
+        """Serialize all fields, or only the requested subset of COMPLAINT_FIELDS"""
+        return {field: COMPLAINT_FIELDS[field][1](self) for field in (fields or COMPLAINT_FIELDS)}
     
     def __repr__(self):
         return f'<Complaint {self.complaint_id}: {self.customer_name}>'
 
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+# Serialized field -> (columns it reads, how it is rendered)
+COMPLAINT_FIELDS = {
+    'id': (['id'], lambda c: c.id),
+    'complaint_id': (['complaint_id'], lambda c: c.complaint_id),
+    'customer_name': (['customer_name'], lambda c: c.customer_name),
+    'customer_phone': (['customer_phone'], lambda c: c.customer_phone),
+    'customer_email': (['customer_email'], lambda c: c.customer_email),
+    'issue_type': (['issue_type'], lambda c: c.issue_type),
+    'description': (['description'], lambda c: c.description),
+    'status': (['status'], lambda c: c.status),
+    'priority': (['priority'], lambda c: c.priority),
+    'location': (['location'], lambda c: c.location),
+    'gps_coordinates': (['gps_coordinates'], lambda c: c.gps_coordinates),
+    'latitude': (['latitude'], lambda c: c.latitude),
+    'longitude': (['longitude'], lambda c: c.longitude),
+    'created_by': (['created_by_id'], lambda c: c.creator.name if c.creator else None),
+    'assigned_to': (['assigned_to_id'], lambda c: c.assignee.name if c.assignee else None),
+    'escalation_level': (['escalation_level'], lambda c: c.escalation_level),
+    'escalated_at': (['escalated_at'], lambda c: _isoformat(c.escalated_at)),
+    'overdue_at': (['overdue_at'], lambda c: _isoformat(c.overdue_at)),
+    'created_at': (['created_at'], lambda c: _isoformat(c.created_at)),
+    'updated_at': (['updated_at'], lambda c: _isoformat(c.updated_at)),
+    'resolved_at': (['resolved_at'], lambda c: _isoformat(c.resolved_at)),
+    'attachments': (['attachments'], lambda c: c.get_attachments()),
+    'attachment_files': ([], lambda c: [attachment.to_dict() for attachment in c.attachment_files]),
+    'duplicate_of_id': (['duplicate_of_id'], lambda c: c.duplicate_of_id),
+    'customer_satisfaction': (['customer_satisfaction'], lambda c: c.customer_satisfaction),
+    'customer_feedback': (['customer_feedback'], lambda c: c.customer_feedback),
+}
@@ -0,0 +1,142 @@
+from src.models.user import db
+from src.models.complaint import Complaint
+from src.utils.sql import dialect_insert, epoch_seconds
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from collections import defaultdict
+
+class ComplaintDailyRollup(db.Model):
+    """Complaint counts per creation day, kept in step with the complaints table"""
+    __tablename__ = 'complaint_daily_rollup'
+
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    priority = db.Column(db.String(20), primary_key=True)
+    issue_type = db.Column(db.String(100), primary_key=True)
+
+    complaint_count = db.Column(db.Integer, nullable=False, default=0)
+    resolved_count = db.Column(db.Integer, nullable=False, default=0)
+    resolution_seconds = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ComplaintDailyRollup {self.day} {self.status}/{self.priority}/{self.issue_type}: {self.complaint_count}>'
+
+def _contribution(created_at, status, priority, issue_type, resolved_at):
+    """The (key, deltas) one complaint adds to the rollup"""
+    key = (created_at.date(), status, priority, issue_type)
+    if resolved_at and created_at:
+        return key, (1, 1, (resolved_at - created_at).total_seconds())
+    return key, (1, 0, 0.0)
+
+def apply_rollup_deltas(conn, deltas):
+    """Add per-key (count, resolved, seconds) deltas with a single upsert"""
+    rows = [{
+        'day': key[0], 'status': key[1], 'priority': key[2], 'issue_type': key[3],
+        'complaint_count': count, 'resolved_count': resolved, 'resolution_seconds': seconds
+    } for key, (count, resolved, seconds) in deltas.items() if count or resolved or seconds]
+    if not rows:
+        return
+
+    table = ComplaintDailyRollup.__table__
+    stmt = dialect_insert(table, bind=conn).values(rows)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['day', 'status', 'priority', 'issue_type'],
+        set_={
+            'complaint_count': table.c.complaint_count + stmt.excluded.complaint_count,
+            'resolved_count': table.c.resolved_count + stmt.excluded.resolved_count,
+            'resolution_seconds': table.c.resolution_seconds + stmt.excluded.resolution_seconds,
+        }
+    ))
+
+def record_new_complaints(conn, rows):
+    """Roll up complaints inserted outside the ORM unit of work (bulk inserts)"""
+    deltas = defaultdict(lambda: [0, 0, 0.0])
+    for row in rows:
+        key, (count, resolved, seconds) = _contribution(
+            row['created_at'], row['status'], row['priority'], row['issue_type'], row.get('resolved_at')
+        )
+        deltas[key][0] += count
+        deltas[key][1] += resolved
+        deltas[key][2] += seconds
+    apply_rollup_deltas(conn, deltas)
+
+def rebuild_rollup_days(conn, days=None):
+    """Recompute the rollup from complaints for the given days (all days if None)"""
+    table = ComplaintDailyRollup.__table__
+    resolution = epoch_seconds(Complaint.resolved_at) - epoch_seconds(Complaint.created_at)
+    source = db.select(
+        func.date(Complaint.created_at),
+        Complaint.status,
+        Complaint.priority,
+        Complaint.issue_type,
+        func.count(Complaint.id),
+        func.count(Complaint.resolved_at),
+        func.coalesce(func.sum(db.case((Complaint.resolved_at.isnot(None), resolution))), 0)
+    ).group_by(
+        func.date(Complaint.created_at), Complaint.status, Complaint.priority, Complaint.issue_type
+    )
+    columns = ['day', 'status', 'priority', 'issue_type',
+               'complaint_count', 'resolved_count', 'resolution_seconds']
+
+    if days is None:
+        conn.execute(table.delete())
+        conn.execute(table.insert().from_select(columns, source.where(Complaint.created_at.isnot(None))))
+        return
+
+    for day in sorted(set(days)):
+        start = datetime.combine(day, datetime.min.time())
+        conn.execute(table.delete().where(table.c.day == day))
+        conn.execute(table.insert().from_select(columns, source.where(
+            Complaint.created_at >= start,
+            Complaint.created_at < start + timedelta(days=1)
+        )))
+
+def _old_value(state, name):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+ROLLUP_FIELDS = ('created_at', 'status', 'priority', 'issue_type', 'resolved_at')
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_rollup(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0, 0.0])
+    stale_days = set()
+
+    def add(values, sign):
+        key, (count, resolved, seconds) = _contribution(*values)
+        deltas[key][0] += sign * count
+        deltas[key][1] += sign * resolved
+        deltas[key][2] += sign * seconds
+
+    for obj in session.new:
+        if isinstance(obj, Complaint) and obj.created_at:
+            add([getattr(obj, f) for f in ROLLUP_FIELDS], 1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Complaint):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[f].history.has_changes() for f in ROLLUP_FIELDS):
+            continue
+        old = [_old_value(state, f) for f in ROLLUP_FIELDS]
+        if old[0] is None or any(v is None for v in old[1:4]):
+            # Previous values were never loaded; recount the day instead
+            stale_days.add((old[0] or obj.created_at).date())
+            continue
+        add(old, -1)
+        add([getattr(obj, f) for f in ROLLUP_FIELDS], 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Complaint) and obj.created_at:
+            add([_old_value(inspect(obj), f) for f in ROLLUP_FIELDS], -1)
+
+    if deltas or stale_days:
+        conn = session.connection()
+        apply_rollup_deltas(conn, deltas)
+        if stale_days:
+            rebuild_rollup_days(conn, stale_days)
@@ -0,0 +1,48 @@
+from src.models.user import db
+from src.utils.sql import dialect_insert
+from sqlalchemy import Integer, cast, func
+
+class ComplaintSequence(db.Model):
+    """Last complaint number handed out per year"""
+    __tablename__ = 'complaint_sequences'
+    
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def _highest_existing_number(cls, conn, year):
+        from src.models.complaint import Complaint
+        return conn.execute(
+            db.select(func.max(cast(func.substr(Complaint.complaint_id, 6), Integer)))
+            .where(Complaint.complaint_id.like(f'{year}-%'))
+        ).scalar() or 0
+    
+    @classmethod
+    def reserve(cls, year, count=1):
+        """Atomically reserve count consecutive numbers for year.
+        
+        Runs in its own short transaction, like a database sequence, so the
+        counter row is never locked for the length of a request. Returns the
+        first reserved number.
+        """
+        table = cls.__table__
+        bump = db.update(table).where(table.c.year == year).values(
+            last_number=table.c.last_number + count
+        ).returning(table.c.last_number)
+        
+        with db.engine.begin() as conn:
+            row = conn.execute(bump).first()
+            if row is None:
+                # First complaint of the year (or first run after upgrading):
+                # continue from any IDs issued by the old LIKE-scan generator
+                conn.execute(
+                    dialect_insert(table, bind=conn).values(
+                        year=year, last_number=cls._highest_existing_number(conn, year)
+                    ).on_conflict_do_nothing(index_elements=['year'])
+                )
+                row = conn.execute(bump).first()
+        
+        return row.last_number - count + 1
+    
+    def __repr__(self):
+        return f'<ComplaintSequence {self.year}: {self.last_number}>'
@@ -1,9 +1,20 @@
 from src.models.user import db
-from datetime import datetime, date
-import json
+from src.models.workforce_task import TASK_COMPLETED, WorkforceTask, task_text
+from src.utils.geo import parse_gps
+from src.utils.sql import epoch_seconds
+from sqlalchemy import func
+from datetime import datetime, date, timedelta
 
 class WorkforceEntry(db.Model):
     __tablename__ = 'workforce_entries'
+    __table_args__ = (
+        # One entry per staff member per shift; also serves per-staff lookups
+        db.Index('uq_workforce_entries_staff_date', 'staff_id', 'shift_date', unique=True),
+        # Daily attendance stats and summaries
+        db.Index('ix_workforce_entries_date_status', 'shift_date', 'status'),
+        # max(updated_at) for list ETags
+        db.Index('ix_workforce_entries_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     staff_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -16,17 +27,25 @@ class WorkforceEntry(db.Model):
     check_out_location = db.Column(db.String(200), nullable=True)
     check_in_gps = db.Column(db.String(50), nullable=True)
     check_out_gps = db.Column(db.String(50), nullable=True)
+    check_in_latitude = db.Column(db.Float, nullable=True)  # Parsed from check_in_gps
+    check_in_longitude = db.Column(db.Float, nullable=True)
     
     # Status tracking
     status = db.Column(db.String(50), nullable=False, default='Scheduled')  # Scheduled, Present, Absent, Late, On Leave
     
-    # Task assignments (stored as JSON array)
+    # Legacy task lists (JSON arrays); tasks are WorkforceTask rows now, and
+    # upgrade-db moves anything left here into workforce_tasks
     assigned_tasks = db.Column(db.Text, nullable=True)  # JSON array of tasks
     completed_tasks = db.Column(db.Text, nullable=True)  # JSON array of completed tasks
     
     # Work location
     work_location = db.Column(db.String(200), nullable=True)
     work_area_gps = db.Column(db.String(50), nullable=True)
+    work_area_latitude = db.Column(db.Float, nullable=True)  # Parsed from work_area_gps
+    work_area_longitude = db.Column(db.Float, nullable=True)
+    
+    # Shift length, stored whenever both times are set so reports can SUM/AVG it
+    minutes_worked = db.Column(db.Integer, nullable=True)
     
     # Notes and comments
     notes = db.Column(db.Text, nullable=True)
@@ -38,18 +57,55 @@ class WorkforceEntry(db.Model):
     
     # Relationships
     staff_member = db.relationship('User', backref='workforce_entries')
+    tasks = db.relationship('WorkforceTask', back_populates='entry', order_by='WorkforceTask.id',
+                            cascade='all, delete-orphan')
+    
+    @db.validates('check_in_gps', 'work_area_gps')
+    def _parse_gps(self, key, value):
+        prefix = key[:-len('_gps')]
+        lat, lon = parse_gps(value)
+        setattr(self, f'{prefix}_latitude', lat)
+        setattr(self, f'{prefix}_longitude', lon)
+        return value
+    
+    def touch(self, at=None):
+        """Bump updated_at for a change outside the entry's own columns, such
+        as to its tasks, so list ETags built from updated_at change with it"""
+        self.updated_at = at or datetime.utcnow()
     
     def set_assigned_tasks(self, tasks):
-        self.assigned_tasks = json.dumps(tasks) if tasks else None
+        """Replace the shift's task list; tasks that stay keep their status"""
+        current = {}
+        for task in self.tasks:
+            current.setdefault(task.task, []).append(task)
+        kept = []
+        for text in map(task_text, tasks or []):
+            matches = current.get(text)
+            kept.append(matches.pop(0) if matches else WorkforceTask(task=text))
+        self.tasks = kept
+        self.touch()
     
     def get_assigned_tasks(self):
-        return json.loads(self.assigned_tasks) if self.assigned_tasks else []
+        return [task.task for task in self.tasks]
     
     def set_completed_tasks(self, tasks):
-        self.completed_tasks = json.dumps(tasks) if tasks else None
+        """Mark exactly these tasks completed, adding any not yet on the shift"""
+        completed = list(dict.fromkeys(map(task_text, tasks or [])))
+        for task in self.tasks:
+            if task.task in completed:
+                task.complete()
+            elif task.status == TASK_COMPLETED:
+                task.reopen()
+        existing = {task.task for task in self.tasks}
+        for text in completed:
+            if text not in existing:
+                task = WorkforceTask(task=text)
+                task.complete()
+                self.tasks.append(task)
+        self.touch()
     
     def get_completed_tasks(self):
-        return json.loads(self.completed_tasks) if self.completed_tasks else []
+        return [task.task for task in self.tasks if task.status == TASK_COMPLETED]
     
     def calculate_hours_worked(self):
         if self.check_in_time and self.check_out_time:
@@ -65,41 +121,37 @@ class WorkforceEntry(db.Model):
             return duration.total_seconds() / 3600  # Return hours as float
         return 0
     
-    def to_dict(self):
-        # Get staff member info safely
-        staff_name = None
-        staff_number = None
-        
-        if self.staff_id:
-            from src.models.user import User
-            staff = User.query.get(self.staff_id)
-            if staff:
-                staff_name = staff.name
-                staff_number = staff.staff_number
-        
-        return {
-            'id': self.id,
-            'staff_id': self.staff_id,
-            'staff_name': staff_name,
-            'staff_number': staff_number,
-            'shift_date': self.shift_date.isoformat() if self.shift_date else None,
-            'check_in_time': self.check_in_time.strftime('%H:%M') if self.check_in_time else None,
-            'check_out_time': self.check_out_time.strftime('%H:%M') if self.check_out_time else None,
-            'check_in_location': self.check_in_location,
-            'check_out_location': self.check_out_location,
-            'check_in_gps': self.check_in_gps,
-            'check_out_gps': self.check_out_gps,
-            'status': self.status,
-            'assigned_tasks': self.get_assigned_tasks(),
-            'completed_tasks': self.get_completed_tasks(),
-            'work_location': self.work_location,
-            'work_area_gps': self.work_area_gps,
-            'notes': self.notes,
-            'supervisor_notes': self.supervisor_notes,
-            'hours_worked': self.calculate_hours_worked(),
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    @classmethod
+    def shift_seconds(cls, check_out_time=None):
+        """SQL expression for the shift length in seconds, like
+        calculate_hours_worked(); NULL until both times are set.
+        Pass check_out_time to use a value being written instead of the column."""
+        check_out_time = cls.check_out_time if check_out_time is None else check_out_time
+        seconds = epoch_seconds(check_out_time) - epoch_seconds(cls.check_in_time)
+        # Checked out after midnight
+        return db.case((seconds < 0, seconds + 86400), else_=seconds)
+    
+    @classmethod
+    def minutes_worked_expression(cls, check_out_time=None):
+        """SQL value for minutes_worked, for rows written outside the ORM"""
+        return db.cast(func.round(cls.shift_seconds(check_out_time) / 60), db.Integer)
+    
+    @classmethod
+    def load_fields(cls, query, fields=None, extra_columns=()):
+        """Restrict the SELECT to the columns to_dict(fields) renders, with
+        task rows loaded in one extra query when they are rendered"""
+        options = []
+        if fields:
+            columns = {'id'} | {column for field in fields for column in WORKFORCE_FIELDS[field][0]}
+            columns.update(extra_columns)
+            options.append(db.load_only(*[getattr(cls, column) for column in columns]))
+        if not fields or TASK_FIELDS & set(fields):
+            options.append(db.selectinload(cls.tasks))
+        return query.options(*options)
+    
+    def to_dict(self, fields=None):
+        """Serialize all fields, or only the requested subset of WORKFORCE_FIELDS"""
+        return {field: WORKFORCE_FIELDS[field][1](self) for field in (fields or WORKFORCE_FIELDS)}
     
     def __repr__(self):
         staff_name = "Unknown"
@@ -110,3 +162,47 @@ class WorkforceEntry(db.Model):
                 staff_name = staff.name
         return f'<WorkforceEntry {staff_name} - {self.shift_date}>'
 
+@db.event.listens_for(WorkforceEntry, 'before_insert')
+@db.event.listens_for(WorkforceEntry, 'before_update')
+def _store_minutes_worked(mapper, connection, entry):
+    if entry.check_in_time and entry.check_out_time:
+        entry.minutes_worked = round(entry.calculate_hours_worked() * 60)
+    else:
+        entry.minutes_worked = None
+
+
+def _format_time(value):
+    return value.strftime('%H:%M') if value else None
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+# Serialized field -> (columns it reads, how it is rendered)
+WORKFORCE_FIELDS = {
+    'id': (['id'], lambda e: e.id),
+    'staff_id': (['staff_id'], lambda e: e.staff_id),
+    'staff_name': (['staff_id'], lambda e: e.staff_member.name if e.staff_member else None),
+    'staff_number': (['staff_id'], lambda e: e.staff_member.staff_number if e.staff_member else None),
+    'shift_date': (['shift_date'], lambda e: _isoformat(e.shift_date)),
+    'check_in_time': (['check_in_time'], lambda e: _format_time(e.check_in_time)),
+    'check_out_time': (['check_out_time'], lambda e: _format_time(e.check_out_time)),
+    'check_in_location': (['check_in_location'], lambda e: e.check_in_location),
+    'check_out_location': (['check_out_location'], lambda e: e.check_out_location),
+    'check_in_gps': (['check_in_gps'], lambda e: e.check_in_gps),
+    'check_out_gps': (['check_out_gps'], lambda e: e.check_out_gps),
+    'status': (['status'], lambda e: e.status),
+    'assigned_tasks': ([], lambda e: e.get_assigned_tasks()),
+    'completed_tasks': ([], lambda e: e.get_completed_tasks()),
+    'tasks': ([], lambda e: [task.to_dict() for task in e.tasks]),
+    'work_location': (['work_location'], lambda e: e.work_location),
+    'work_area_gps': (['work_area_gps'], lambda e: e.work_area_gps),
+    'notes': (['notes'], lambda e: e.notes),
+    'supervisor_notes': (['supervisor_notes'], lambda e: e.supervisor_notes),
+    'hours_worked': (['minutes_worked'], lambda e: e.minutes_worked / 60 if e.minutes_worked is not None else 0),
+    'minutes_worked': (['minutes_worked'], lambda e: e.minutes_worked),
+    'created_at': (['created_at'], lambda e: _isoformat(e.created_at)),
+    'updated_at': (['updated_at'], lambda e: _isoformat(e.updated_at)),
+}
+
+# Fields rendered from WorkforceTask rows
+TASK_FIELDS = {'assigned_tasks', 'completed_tasks', 'tasks'}
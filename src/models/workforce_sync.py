@@ -0,0 +1,35 @@
+from src.models.user import db
+from datetime import datetime
+
+class WorkforceSyncEvent(db.Model):
+    """Ledger of offline events received through /api/workforce/sync.
+
+    The unique (staff_id, client_event_id) index makes resending a batch
+    harmless: events already applied are reported, not applied again.
+    Rejected events are not recorded, so a resend evaluates them again.
+    """
+    __tablename__ = 'workforce_sync_events'
+    __table_args__ = (
+        db.Index('uq_workforce_sync_events_staff_event', 'staff_id', 'client_event_id', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    staff_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    client_event_id = db.Column(db.String(64), nullable=False)  # Generated on the device
+    event_type = db.Column(db.String(30), nullable=False)  # check_in, check_out, task_completed
+    occurred_at = db.Column(db.DateTime, nullable=True)  # Device time, server-local
+    shift_date = db.Column(db.Date, nullable=True)
+    outcome = db.Column(db.String(20), nullable=False)  # applied (rejected on older rows)
+    error = db.Column(db.String(200), nullable=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_result(self):
+        result = {'id': self.client_event_id, 'outcome': 'duplicate', 'original_outcome': self.outcome}
+        if self.shift_date:
+            result['shift_date'] = self.shift_date.isoformat()
+        if self.error:
+            result['error'] = self.error
+        return result
+
+    def __repr__(self):
+        return f'<WorkforceSyncEvent {self.staff_id}/{self.client_event_id}: {self.outcome}>'
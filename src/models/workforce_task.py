@@ -0,0 +1,52 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+TASK_PENDING = 'Pending'
+TASK_COMPLETED = 'Completed'
+
+def task_text(value):
+    """Tasks are free text; anything else a client sends is kept as JSON"""
+    return value if isinstance(value, str) else json.dumps(value)
+
+class WorkforceTask(db.Model):
+    """One task on a staff member's shift, optionally for a complaint"""
+    __tablename__ = 'workforce_tasks'
+    __table_args__ = (
+        # A shift's tasks, and outstanding work joined from the day's entries
+        db.Index('ix_workforce_tasks_entry_status', 'entry_id', 'status'),
+        db.Index('ix_workforce_tasks_complaint', 'complaint_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.Integer, db.ForeignKey('workforce_entries.id'), nullable=False)
+    task = db.Column(db.Text, nullable=False)
+    complaint_id = db.Column(db.Integer, db.ForeignKey('complaints.id'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default=TASK_PENDING)  # Pending, Completed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    entry = db.relationship('WorkforceEntry', back_populates='tasks')
+
+    def complete(self, completed_at=None):
+        if self.status != TASK_COMPLETED:
+            self.status = TASK_COMPLETED
+            self.completed_at = completed_at or datetime.utcnow()
+
+    def reopen(self):
+        self.status = TASK_PENDING
+        self.completed_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entry_id': self.entry_id,
+            'task': self.task,
+            'complaint_id': self.complaint_id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+    def __repr__(self):
+        return f'<WorkforceTask {self.entry_id}: {self.task} ({self.status})>'
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import User, db
+from src.utils.ratelimit import rate_limit_target
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
@@ -25,6 +26,7 @@ def admin_required(f):
     return decorated_function
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit_target(lambda: (request.get_json(silent=True) or {}).get('staff_number'))
 def login():
     try:
         data = request.get_json()
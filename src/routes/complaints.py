@@ -1,26 +1,67 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, send_file, session
 from src.models.user import User, db
-from src.models.complaint import Complaint
+from src.models.complaint import COMPLAINT_FIELDS, Complaint
+from src.models.complaint_sequence import ComplaintSequence
+from src.models.attachment import Attachment
+from src.models.complaint_rollup import rebuild_rollup_days, record_new_complaints
 from src.routes.auth import login_required
+from src.utils.pagination import clamp_limit, keyset_paginate
+from src.utils.search import apply_search
+from src.utils.storage import FileTooLarge, blob_path, store_stream
+from src.utils.sql import count_if, epoch_seconds
+from src.utils.assignment import assignment_engine
+from src.utils.duplicates import DUPLICATE_STATUS, complaint_fingerprint, find_duplicate_parents
+from src.utils.events import broker, complaint_event
+from src.utils.fields import parse_fields
+from src.utils.geo import bounding_box, cells_within, gps_columns, haversine_km
+from src.utils.http import collection_etag, is_not_modified, not_modified_response, page_etag, row_etag
+from src.utils.sla import ESCALATION_ROLES, MAX_ESCALATION_LEVEL, OPEN_STATUSES, SLA_HOURS, escalation_target_id
 from datetime import datetime, timedelta
+from sqlalchemy import func
+import json
 import os
+import threading
 
 complaints_bp = Blueprint('complaints', __name__)
 
+# Per-worker block of reserved complaint numbers: year -> (next, end)
+_reserved_numbers = {}
+_reserved_lock = threading.Lock()
+
+def format_complaint_id(year, number):
+    """YYYY-NNNN, widening past 9999 rather than wrapping"""
+    return f'{year}-{number:04d}'
+
 def generate_complaint_id():
     """Generate unique complaint ID in format YYYY-NNNN"""
     year = datetime.now().year
-    last_complaint = Complaint.query.filter(
-        Complaint.complaint_id.like(f'{year}-%')
-    ).order_by(Complaint.complaint_id.desc()).first()
+    block_size = max(1, current_app.config.get('COMPLAINT_ID_BLOCK_SIZE', 1))
     
-    if last_complaint:
-        last_number = int(last_complaint.complaint_id.split('-')[1])
-        new_number = last_number + 1
-    else:
-        new_number = 1
+    with _reserved_lock:
+        next_number, end = _reserved_numbers.get(year, (0, 0))
+        if next_number >= end:
+            next_number = ComplaintSequence.reserve(year, block_size)
+            end = next_number + block_size
+        _reserved_numbers[year] = (next_number + 1, end)
+    
+    return format_complaint_id(year, next_number)
+
+def generate_complaint_ids(count):
+    """Reserve count consecutive complaint IDs in a single round trip"""
+    year = datetime.now().year
+    first = ComplaintSequence.reserve(year, count)
+    return [format_complaint_id(year, number) for number in range(first, first + count)]
+
+def validate_complaint_data(data):
+    """Return an error message if data is not a valid new complaint"""
+    if not isinstance(data, dict):
+        return 'Complaint must be a JSON object'
     
-    return f'{year}-{new_number:04d}'
+    required_fields = ['customer_name', 'customer_phone', 'issue_type', 'description']
+    for field in required_fields:
+        if not data.get(field):
+            return f'{field} is required'
+    return None
 
 @complaints_bp.route('/', methods=['GET'])
 @login_required
@@ -31,6 +72,10 @@ def get_complaints():
         status = request.args.get('status')
         priority = request.args.get('priority')
         search = request.args.get('search')
+        try:
+            fields = parse_fields(request.args.get('fields'), COMPLAINT_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         query = Complaint.query
         
@@ -39,15 +84,50 @@ def get_complaints():
             query = query.filter(Complaint.status == status)
         if priority and priority != 'All':
             query = query.filter(Complaint.priority == priority)
+        rank = None
         if search:
-            query = query.filter(
-                (Complaint.customer_name.contains(search)) |
-                (Complaint.complaint_id.contains(search)) |
-                (Complaint.description.contains(search))
-            )
-        
-        # Order by creation date (newest first)
-        query = query.order_by(Complaint.created_at.desc())
+            query, rank = apply_search(query, search)
+        
+        # Cursor mode: seek on (created_at, id) instead of COUNT + OFFSET
+        if 'cursor' in request.args or 'limit' in request.args:
+            query = Complaint.with_people(query, fields, extra_columns=['created_at', 'updated_at'])
+            try:
+                complaints, next_cursor, total = keyset_paginate(
+                    query,
+                    [Complaint.created_at, Complaint.id],
+                    lambda c: (c.created_at, c.id),
+                    cursor=request.args.get('cursor'),
+                    limit=request.args.get('limit', 20, type=int),
+                    descending=True,
+                    with_total=request.args.get('include_total') == 'true'
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            etag = page_etag(complaints, next_cursor, total)
+            if is_not_modified(etag):
+                return not_modified_response(etag)
+            
+            result = {
+                'complaints': [complaint.to_dict(fields) for complaint in complaints],
+                'next_cursor': next_cursor,
+                'limit': clamp_limit(request.args.get('limit', 20, type=int))
+            }
+            if total is not None:
+                result['total'] = total
+            return jsonify(result), 200, {'ETag': f'"{etag}"'}
+        
+        etag = collection_etag(query, Complaint.updated_at)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        query = Complaint.with_people(query, fields)
+        
+        # Order by search relevance if any, then creation date (newest first)
+        if rank is not None:
+            query = query.order_by(rank, Complaint.created_at.desc())
+        else:
+            query = query.order_by(Complaint.created_at.desc())
         
         # Paginate
         complaints = query.paginate(
@@ -55,12 +135,12 @@ def get_complaints():
         )
         
         return jsonify({
-            'complaints': [complaint.to_dict() for complaint in complaints.items],
+            'complaints': [complaint.to_dict(fields) for complaint in complaints.items],
             'total': complaints.total,
             'pages': complaints.pages,
             'current_page': page,
             'per_page': per_page
-        }), 200
+        }), 200, {'ETag': f'"{etag}"'}
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -71,10 +151,9 @@ def create_complaint():
     try:
         data = request.get_json()
         
-        required_fields = ['customer_name', 'customer_phone', 'issue_type', 'description']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
+        error = validate_complaint_data(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         complaint = Complaint(
             complaint_id=generate_complaint_id(),
@@ -89,16 +168,45 @@ def create_complaint():
             created_by_id=session['user_id']
         )
         
-        # Set assigned user if provided
+        # Repeat reports of the same fault join the open complaint instead of adding work
+        complaint.fingerprint = complaint_fingerprint(
+            complaint.customer_phone, complaint.issue_type, complaint.geo_cell
+        )
+        parent_id = None
+        if complaint.fingerprint and not data.get('allow_duplicate'):
+            parent_id = find_duplicate_parents([complaint.fingerprint]).get(complaint.fingerprint)
+        if parent_id:
+            complaint.status = DUPLICATE_STATUS
+            complaint.duplicate_of_id = parent_id
+        
+        # Set assigned user if provided, or pick one when auto-assignment is requested
+        auto_assign = data.get('auto_assign') and not parent_id
         if data.get('assigned_to_id'):
             complaint.assigned_to_id = data['assigned_to_id']
+        elif auto_assign:
+            complaint.assigned_to_id = assignment_engine.assign(complaint.latitude, complaint.longitude)
         
         # Handle file attachments
         if data.get('attachments'):
             complaint.set_attachments(data['attachments'])
         
         db.session.add(complaint)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except Exception:
+            if auto_assign:
+                assignment_engine.adjust_load(complaint.assigned_to_id, -1)
+            raise
+        if data.get('assigned_to_id') and not parent_id:
+            assignment_engine.adjust_load(complaint.assigned_to_id, 1)
+        broker.publish('complaint.created', complaint_event(complaint))
+        
+        if parent_id:
+            return jsonify({
+                'message': 'Complaint recorded as a duplicate of an open complaint',
+                'duplicate_of_id': parent_id,
+                'complaint': complaint.to_dict()
+            }), 200
         
         return jsonify({
             'message': 'Complaint created successfully',
@@ -108,12 +216,316 @@ def create_complaint():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+BULK_CHUNK_SIZE = 500
+
+def _read_bulk_rows():
+    """Yield incoming complaints from a JSON array or an NDJSON stream"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        # Read line by line so large uploads are never held in memory at once
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+    else:
+        data = request.get_json()
+        if not isinstance(data, list):
+            raise ValueError('Expected a JSON array of complaints')
+        yield from data
+
+def _insert_complaint_chunk(chunk, results):
+    """Insert one chunk of validated rows in one transaction of executemany inserts.
+
+    Rows repeating an open complaint, or an earlier row in the chunk, are
+    stored as duplicates linked to it and are not assigned.
+    """
+    complaint_ids = generate_complaint_ids(len(chunk))
+    now = datetime.utcnow()
+    parents = find_duplicate_parents(
+        {values['fingerprint'] for _, values, _, check_duplicates in chunk if check_duplicates}, now
+    )
+    originals, duplicates = [], []
+    # Fingerprint -> position in originals of the first row reporting it, and the
+    # duplicates waiting on that row's id, which is known after the insert
+    chunk_parents, pending = {}, []
+    for (row_number, values, auto_assign, check_duplicates), complaint_id in zip(chunk, complaint_ids):
+        values['complaint_id'] = complaint_id
+        values['created_at'] = now
+        values['updated_at'] = now
+        fingerprint = values['fingerprint']
+        if check_duplicates and fingerprint is not None:
+            if fingerprint in parents:
+                values['status'] = DUPLICATE_STATUS
+                values['duplicate_of_id'] = parents[fingerprint]
+                duplicates.append(values)
+                continue
+            if fingerprint in chunk_parents:
+                values['status'] = DUPLICATE_STATUS
+                pending.append((values, chunk_parents[fingerprint]))
+                duplicates.append(values)
+                continue
+        if fingerprint is not None:
+            chunk_parents.setdefault(fingerprint, len(originals))
+        if values['assigned_to_id']:
+            assignment_engine.adjust_load(values['assigned_to_id'], 1)
+        elif auto_assign:
+            values['assigned_to_id'] = assignment_engine.assign(values['latitude'], values['longitude'])
+        originals.append(values)
+    
+    try:
+        if originals:
+            original_ids = db.session.execute(
+                db.insert(Complaint).returning(Complaint.id, sort_by_parameter_order=True), originals
+            ).scalars().all()
+            for values, position in pending:
+                values['duplicate_of_id'] = original_ids[position]
+        if duplicates:
+            db.session.execute(db.insert(Complaint), duplicates)
+        record_new_complaints(db.session.connection(), originals + duplicates)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        # Loads counted for this chunk are now wrong; reload on next use
+        assignment_engine.invalidate()
+        for row_number, values, _, _ in chunk:
+            results.append({'row': row_number, 'error': str(e)})
+        return 0
+    
+    for row_number, values, _, _ in chunk:
+        result = {'row': row_number, 'complaint_id': values['complaint_id']}
+        if values['duplicate_of_id']:
+            result['duplicate_of_id'] = values['duplicate_of_id']
+        results.append(result)
+    broker.publish('complaints.bulk_created', {
+        'complaint_ids': [values['complaint_id'] for _, values, _, _ in chunk]
+    })
+    return len(chunk)
+
+@complaints_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk_create_complaints():
+    """Ingest many complaints (JSON array or NDJSON) in chunked batch inserts"""
+    try:
+        created_by_id = session['user_id']
+        auto_assign = request.args.get('auto_assign') == 'true'
+        allow_duplicates = request.args.get('allow_duplicates') == 'true'
+        results = []
+        chunk = []
+        created = 0
+        
+        for row_number, data in enumerate(_read_bulk_rows(), start=1):
+            error = validate_complaint_data(data) if data is not None else 'Invalid JSON'
+            if error:
+                results.append({'row': row_number, 'error': error})
+                continue
+            
+            location = gps_columns(data.get('gps_coordinates'))
+            chunk.append((row_number, {
+                'customer_name': data['customer_name'],
+                'customer_phone': data['customer_phone'],
+                'customer_email': data.get('customer_email'),
+                'issue_type': data['issue_type'],
+                'description': data['description'],
+                'status': 'Open',
+                'priority': data.get('priority', 'Medium'),
+                'location': data.get('location'),
+                'gps_coordinates': data.get('gps_coordinates'),
+                **location,
+                'fingerprint': complaint_fingerprint(
+                    data['customer_phone'], data['issue_type'], location['geo_cell']
+                ),
+                'duplicate_of_id': None,
+                'created_by_id': created_by_id,
+                'assigned_to_id': data.get('assigned_to_id') or None,
+                'attachments': json.dumps(data['attachments']) if data.get('attachments') else None
+            }, auto_assign or data.get('auto_assign'), not (allow_duplicates or data.get('allow_duplicate'))))
+            
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                created += _insert_complaint_chunk(chunk, results)
+                chunk = []
+        
+        if chunk:
+            created += _insert_complaint_chunk(chunk, results)
+        
+        results.sort(key=lambda result: result['row'])
+        return jsonify({
+            'created': created,
+            'duplicates': sum(1 for result in results if 'duplicate_of_id' in result),
+            'failed': len(results) - created,
+            'results': results
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+BULK_UPDATE_FIELDS = ('status', 'priority', 'assigned_to_id')
+BULK_FILTER_FIELDS = ('status', 'priority', 'issue_type', 'assigned_to_id', 'escalation_level')
+# Values a bulk change may set; Duplicate needs duplicate_of_id, so it is not one of them
+BULK_STATUSES = ('Open', 'In Progress', 'Resolved', 'Closed')
+BULK_PRIORITIES = ('Low', 'Medium', 'High', 'Critical')
+# Updating everything a filter matches is a supervisor operation
+BULK_FILTER_ROLES = ('Supervisor', 'Admin')
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def bulk_update_error(changes, ids, filters):
+    """Return an error message if a bulk update request is not valid"""
+    if not isinstance(changes, dict) or not changes or set(changes) - set(BULK_UPDATE_FIELDS):
+        return f'changes may only set {", ".join(BULK_UPDATE_FIELDS)}'
+    if not isinstance(filters, dict) or set(filters) - set(BULK_FILTER_FIELDS):
+        return f'filter may only use {", ".join(BULK_FILTER_FIELDS)}'
+    if not ids and not filters:
+        return 'ids or filter is required'
+    if ids is not None and not (isinstance(ids, list) and all(_is_id(i) for i in ids)):
+        return 'ids must be a list of integers'
+    if 'status' in changes and changes['status'] not in BULK_STATUSES:
+        return f'status must be one of {", ".join(BULK_STATUSES)}'
+    if 'priority' in changes and changes['priority'] not in BULK_PRIORITIES:
+        return f'priority must be one of {", ".join(BULK_PRIORITIES)}'
+    if changes.get('assigned_to_id') is not None and not _is_id(changes['assigned_to_id']):
+        return 'assigned_to_id must be an integer or null'
+    for field, value in filters.items():
+        if not (value is None or isinstance(value, str) or _is_id(value)):
+            return f'filter {field} must be a single value'
+    return None
+
+@complaints_bp.route('/bulk', methods=['PATCH'])
+@login_required
+def bulk_update_complaints():
+    """Apply one change set to many complaints with a single UPDATE"""
+    try:
+        data = request.get_json() or {}
+        changes = data.get('changes') or {}
+        ids = data.get('ids')
+        filters = data.get('filter') or {}
+        
+        error = bulk_update_error(changes, ids, filters)
+        if error:
+            return jsonify({'error': error}), 400
+        if not ids:
+            user = db.session.get(User, session['user_id'])
+            if not user or user.role not in BULK_FILTER_ROLES:
+                return jsonify({'error': 'Supervisor or Admin access required to update by filter'}), 403
+        if changes.get('assigned_to_id') is not None and db.session.get(User, changes['assigned_to_id']) is None:
+            return jsonify({'error': 'Assignee not found'}), 400
+        
+        conditions = [getattr(Complaint, field) == value for field, value in filters.items()]
+        if ids:
+            conditions.append(Complaint.id.in_(ids))
+        
+        values = dict(changes)
+        if changes.get('status') == 'Resolved':
+            # Only stamp rows that are actually moving to Resolved
+            values['resolved_at'] = db.case(
+                (Complaint.status != 'Resolved', datetime.utcnow()),
+                else_=Complaint.resolved_at
+            )
+        
+        result = db.session.execute(
+            db.update(Complaint).where(*conditions).values(**values)
+            .returning(Complaint.id, Complaint.created_at)
+            .execution_options(synchronize_session=False)
+        )
+        updated = result.all()
+        updated_ids = [row.id for row in updated]
+        
+        # Recount the reporting rollup for the creation days that were touched
+        rebuild_rollup_days(
+            db.session.connection(),
+            {row.created_at.date() for row in updated if row.created_at}
+        )
+        db.session.commit()
+        if updated_ids and ('status' in values or 'assigned_to_id' in values):
+            # Open-complaint loads moved in bulk; recount them on next use
+            assignment_engine.invalidate()
+        broker.publish('complaints.bulk_updated', {'ids': updated_ids, 'changes': changes})
+        
+        return jsonify({
+            'message': 'Complaints updated successfully',
+            'updated': len(updated_ids),
+            'ids': updated_ids
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+NEARBY_MAX_RADIUS_KM = 200
+NEARBY_MAX_RESULTS = 500
+
+@complaints_bp.route('/nearby', methods=['GET'])
+@login_required
+def get_nearby_complaints():
+    """Complaints within radius_km of (lat, lon), nearest first"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        radius_km = request.args.get('radius_km', 5, type=float)
+        status = request.args.get('status')
+        limit = min(request.args.get('limit', 100, type=int), NEARBY_MAX_RESULTS)
+        try:
+            fields = parse_fields(request.args.get('fields'), COMPLAINT_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({'error': 'Valid lat and lon are required'}), 400
+        if not (0 < radius_km <= NEARBY_MAX_RADIUS_KM):
+            return jsonify({'error': f'radius_km must be between 0 and {NEARBY_MAX_RADIUS_KM}'}), 400
+        
+        # Candidate rows from the covering grid cells (or a bounding box for
+        # very large radii), then an exact haversine filter on the few left
+        candidates = db.session.query(Complaint.id, Complaint.latitude, Complaint.longitude)
+        cells = cells_within(lat, lon, radius_km)
+        if cells is not None:
+            candidates = candidates.filter(Complaint.geo_cell.in_(cells))
+        else:
+            min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+            candidates = candidates.filter(
+                Complaint.latitude.between(min_lat, max_lat),
+                Complaint.longitude.between(min_lon, max_lon)
+            )
+        if status and status != 'All':
+            candidates = candidates.filter(Complaint.status == status)
+        
+        distances = {}
+        for row in candidates:
+            distance = haversine_km(lat, lon, row.latitude, row.longitude)
+            if distance <= radius_km:
+                distances[row.id] = distance
+        
+        nearest = sorted(distances, key=distances.get)[:limit]
+        complaints = Complaint.with_people(Complaint.query, fields).filter(Complaint.id.in_(nearest)).all() if nearest else []
+        complaints.sort(key=lambda complaint: distances[complaint.id])
+        
+        return jsonify({
+            'complaints': [
+                dict(complaint.to_dict(fields), distance_km=round(distances[complaint.id], 3))
+                for complaint in complaints
+            ],
+            'total': len(distances)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @complaints_bp.route('/<int:complaint_id>', methods=['GET'])
 @login_required
 def get_complaint(complaint_id):
     try:
-        complaint = Complaint.query.get_or_404(complaint_id)
-        return jsonify({'complaint': complaint.to_dict()}), 200
+        updated_at = db.session.query(Complaint.updated_at).filter_by(id=complaint_id).first_or_404()[0]
+        etag = row_etag(updated_at)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        complaint = Complaint.with_people(Complaint.query).filter_by(id=complaint_id).one()
+        return jsonify({'complaint': complaint.to_dict()}), 200, {'ETag': f'"{etag}"'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -123,6 +535,7 @@ def update_complaint(complaint_id):
     try:
         complaint = Complaint.query.get_or_404(complaint_id)
         data = request.get_json()
+        previous_assignee = complaint.assigned_to_id if complaint.status in OPEN_STATUSES else None
         
         # Update allowed fields
         if 'customer_name' in data:
@@ -149,9 +562,19 @@ def update_complaint(complaint_id):
             complaint.assigned_to_id = data['assigned_to_id']
         if 'attachments' in data:
             complaint.set_attachments(data['attachments'])
+        if any(field in data for field in ('customer_phone', 'issue_type', 'gps_coordinates')):
+            complaint.fingerprint = complaint_fingerprint(
+                complaint.customer_phone, complaint.issue_type, complaint.geo_cell
+            )
         
         db.session.commit()
         
+        current_assignee = complaint.assigned_to_id if complaint.status in OPEN_STATUSES else None
+        if current_assignee != previous_assignee:
+            assignment_engine.adjust_load(previous_assignee, -1)
+            assignment_engine.adjust_load(current_assignee, 1)
+        broker.publish('complaint.updated', complaint_event(complaint))
+        
         return jsonify({
             'message': 'Complaint updated successfully',
             'complaint': complaint.to_dict()
@@ -166,25 +589,31 @@ def escalate_complaint(complaint_id):
     try:
         complaint = Complaint.query.get_or_404(complaint_id)
         
-        if complaint.escalation_level >= 2:
+        if complaint.escalation_level >= MAX_ESCALATION_LEVEL:
             return jsonify({'error': 'Complaint already at maximum escalation level'}), 400
         
         complaint.escalation_level += 1
         complaint.escalated_at = datetime.utcnow()
         
-        # Auto-assign based on escalation level
-        if complaint.escalation_level == 1:
-            # Escalate to supervisor
-            supervisor = User.query.filter_by(role='Supervisor').first()
-            if supervisor:
-                complaint.assigned_to_id = supervisor.id
-        elif complaint.escalation_level == 2:
-            # Escalate to admin
-            admin = User.query.filter_by(role='Admin').first()
-            if admin:
-                complaint.assigned_to_id = admin.id
+        # Auto-assign based on escalation level (level 1: supervisor, level 2: admin),
+        # preferring the nearest, least-loaded one who is checked in
+        previous_assignee = complaint.assigned_to_id
+        picked = assignment_engine.assign(
+            complaint.latitude, complaint.longitude,
+            roles=(ESCALATION_ROLES[complaint.escalation_level],)
+        )
+        assignee_id = picked or escalation_target_id(complaint.escalation_level)
+        if assignee_id:
+            complaint.assigned_to_id = assignee_id
         
         db.session.commit()
+        if picked:
+            # assign() has already counted the new assignee
+            assignment_engine.adjust_load(previous_assignee, -1)
+        elif complaint.assigned_to_id != previous_assignee:
+            assignment_engine.adjust_load(previous_assignee, -1)
+            assignment_engine.adjust_load(complaint.assigned_to_id, 1)
+        broker.publish('complaint.escalated', complaint_event(complaint))
         
         return jsonify({
             'message': f'Complaint escalated to level {complaint.escalation_level}',
@@ -194,6 +623,23 @@ def escalate_complaint(complaint_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@complaints_bp.route('/<int:complaint_id>/duplicates', methods=['GET'])
+@login_required
+def get_duplicates(complaint_id):
+    """Reports that were linked to this complaint as duplicates"""
+    try:
+        duplicates = Complaint.with_people(Complaint.query).filter(
+            Complaint.duplicate_of_id == complaint_id
+        ).order_by(Complaint.created_at).all()
+        
+        return jsonify({
+            'duplicates': [complaint.to_dict() for complaint in duplicates],
+            'count': len(duplicates)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @complaints_bp.route('/<int:complaint_id>/feedback', methods=['POST'])
 def submit_feedback(complaint_id):
     """Allow customers to submit feedback without authentication"""
@@ -219,43 +665,144 @@ def submit_feedback(complaint_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@complaints_bp.route('/<int:complaint_id>/attachments', methods=['POST'])
+@login_required
+def upload_attachment(complaint_id):
+    """Stream an uploaded file (raw body or multipart 'file') into attachment storage"""
+    try:
+        if not db.session.query(Complaint.id).filter_by(id=complaint_id).first():
+            return jsonify({'error': 'Complaint not found'}), 404
+        
+        max_bytes = current_app.config['ATTACHMENT_MAX_BYTES']
+        if request.content_length and request.content_length > max_bytes:
+            return jsonify({'error': f'Attachment exceeds {max_bytes} bytes'}), 413
+        
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if not upload:
+                return jsonify({'error': 'file is required'}), 400
+            stream = upload.stream
+            filename = upload.filename
+            content_type = upload.mimetype
+        else:
+            stream = request.stream
+            filename = request.headers.get('X-Filename') or request.args.get('filename')
+            content_type = request.mimetype
+        
+        if not filename:
+            return jsonify({'error': 'filename is required'}), 400
+        
+        try:
+            sha256, size = store_stream(stream, max_bytes)
+        except FileTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        
+        if size == 0:
+            return jsonify({'error': 'Attachment is empty'}), 400
+        
+        attachment = Attachment(
+            complaint_id=complaint_id,
+            sha256=sha256,
+            filename=os.path.basename(filename)[:255],
+            content_type=content_type or 'application/octet-stream',
+            size=size,
+            uploaded_by_id=session['user_id']
+        )
+        db.session.add(attachment)
+        db.session.execute(
+            db.update(Complaint).where(Complaint.id == complaint_id).values(updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Attachment uploaded successfully',
+            'attachment': attachment.to_dict()
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@complaints_bp.route('/<int:complaint_id>/attachments', methods=['GET'])
+@login_required
+def get_attachments(complaint_id):
+    try:
+        attachments = Attachment.query.filter_by(complaint_id=complaint_id).order_by(Attachment.id).all()
+        return jsonify({
+            'attachments': [attachment.to_dict() for attachment in attachments]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Served inline; anything else (HTML, SVG, ...) downloads, so it never runs in our origin
+INLINE_CONTENT_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/webp', 'application/pdf')
+
+@complaints_bp.route('/<int:complaint_id>/attachments/<int:attachment_id>', methods=['GET'])
+@login_required
+def download_attachment(complaint_id, attachment_id):
+    """Stream a stored attachment; honours Range and conditional requests"""
+    try:
+        attachment = Attachment.query.filter_by(id=attachment_id, complaint_id=complaint_id).first()
+        if not attachment:
+            return jsonify({'error': 'Attachment not found'}), 404
+        
+        path = blob_path(attachment.sha256)
+        if not os.path.exists(path):
+            return jsonify({'error': 'Attachment content is missing from storage'}), 410
+        
+        response = send_file(
+            path,
+            mimetype=attachment.content_type,
+            download_name=attachment.filename,
+            # The type is whatever the uploader claimed; only render known-inert ones
+            as_attachment=attachment.content_type not in INLINE_CONTENT_TYPES,
+            conditional=True,
+            etag=attachment.sha256
+        )
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @complaints_bp.route('/stats', methods=['GET'])
 @login_required
 def get_complaint_stats():
     try:
-        total_complaints = Complaint.query.count()
-        open_complaints = Complaint.query.filter_by(status='Open').count()
-        in_progress_complaints = Complaint.query.filter_by(status='In Progress').count()
-        resolved_complaints = Complaint.query.filter_by(status='Resolved').count()
-        
-        # Today's resolved complaints
         today = datetime.now().date()
-        today_resolved = Complaint.query.filter(
-            Complaint.resolved_at >= today,
-            Complaint.resolved_at < today + timedelta(days=1)
-        ).count()
-        
-        # High priority complaints
-        high_priority = Complaint.query.filter(
-            Complaint.priority.in_(['High', 'Critical']),
-            Complaint.status != 'Resolved'
-        ).count()
-        
-        # Escalated complaints
-        escalated = Complaint.query.filter(Complaint.escalation_level > 0).count()
+        today_start = datetime.combine(today, datetime.min.time())
+        today_end = today_start + timedelta(days=1)
+        resolution_seconds = epoch_seconds(Complaint.resolved_at) - epoch_seconds(Complaint.created_at)
+        
+        # Every counter and the average resolution time in one pass
+        stats = db.session.query(
+            count_if(Complaint.status != DUPLICATE_STATUS).label('total'),
+            count_if(Complaint.status == DUPLICATE_STATUS).label('duplicates'),
+            count_if(Complaint.status == 'Open').label('open'),
+            count_if(Complaint.status == 'In Progress').label('in_progress'),
+            count_if(Complaint.status == 'Resolved').label('resolved'),
+            count_if(db.and_(
+                Complaint.resolved_at >= today_start,
+                Complaint.resolved_at < today_end
+            )).label('today_resolved'),
+            count_if(db.and_(
+                Complaint.priority.in_(['High', 'Critical']),
+                Complaint.status != 'Resolved'
+            )).label('high_priority'),
+            count_if(Complaint.escalation_level > 0).label('escalated'),
+            func.avg(db.case(
+                (Complaint.resolved_at.isnot(None), resolution_seconds)
+            )).label('avg_resolution_seconds')
+        ).one()
+        
+        total_complaints = stats.total
+        open_complaints = stats.open
+        in_progress_complaints = stats.in_progress
+        resolved_complaints = stats.resolved
+        today_resolved = stats.today_resolved
+        high_priority = stats.high_priority
+        escalated = stats.escalated
         
         # Average resolution time (in hours)
-        resolved_with_time = Complaint.query.filter(
-            Complaint.resolved_at.isnot(None)
-        ).all()
-        
-        avg_resolution_hours = 0
-        if resolved_with_time:
-            total_hours = sum([
-                (c.resolved_at - c.created_at).total_seconds() / 3600
-                for c in resolved_with_time
-            ])
-            avg_resolution_hours = total_hours / len(resolved_with_time)
+        avg_resolution_hours = float(stats.avg_resolution_seconds or 0) / 3600
         
         return jsonify({
             'total_complaints': total_complaints,
@@ -265,6 +812,7 @@ def get_complaint_stats():
             'today_resolved': today_resolved,
             'high_priority': high_priority,
             'escalated': escalated,
+            'duplicates': stats.duplicates,
             'avg_resolution_hours': round(avg_resolution_hours, 2)
         }), 200
         
@@ -276,14 +824,22 @@ def get_complaint_stats():
 def get_overdue_complaints():
     """Get complaints that are overdue for escalation"""
     try:
-        # Complaints open for more than 48 hours without escalation
-        cutoff_time = datetime.utcnow() - timedelta(hours=48)
-        
-        overdue = Complaint.query.filter(
-            Complaint.created_at < cutoff_time,
-            Complaint.status.in_(['Open', 'In Progress']),
-            Complaint.escalation_level == 0
-        ).all()
+        # Complaints the SLA sweeper flagged (ix_complaints_overdue_at) plus any that went past
+        # the SLA since its last sweep (ix_complaints_status_escalation_created), still open.
+        # A UNION lets each half use its index; an OR of the two scans every open complaint
+        cutoff_time = datetime.utcnow() - timedelta(hours=SLA_HOURS)
+        flagged = db.select(Complaint.id).where(Complaint.overdue_at.isnot(None))
+        unswept = db.select(Complaint.id).where(
+            Complaint.status.in_(OPEN_STATUSES),
+            Complaint.escalation_level == 0,
+            Complaint.created_at < cutoff_time
+        )
+        overdue_ids = db.union(flagged, unswept).subquery()
+        overdue = Complaint.with_people(Complaint.query).join(
+            overdue_ids, Complaint.id == overdue_ids.c.id
+        ).filter(
+            Complaint.status.in_(OPEN_STATUSES)
+        ).order_by(func.coalesce(Complaint.overdue_at, Complaint.created_at)).all()
         
         return jsonify({
             'overdue_complaints': [complaint.to_dict() for complaint in overdue]
@@ -0,0 +1,43 @@
+from flask import Blueprint, Response, request
+from src.routes.auth import login_required
+from src.utils.events import broker, format_sse
+import time
+
+events_bp = Blueprint('events', __name__)
+
+# Comment line sent when idle so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+# Streams end after this long; EventSource reconnects with Last-Event-ID and the
+# replay buffer fills the gap, so no server thread is held indefinitely
+STREAM_MAX_SECONDS = 600
+
+@events_bp.route('/stream', methods=['GET'])
+@login_required
+def stream_events():
+    """Server-Sent Events feed of complaint and attendance changes.
+
+    Event types: complaint.created, complaint.updated, complaint.escalated,
+    complaints.bulk_created, complaints.bulk_updated, attendance.check_in,
+    attendance.check_out, and resync when the client fell too far behind
+    and should refetch.
+
+    Each open stream occupies a request thread for up to STREAM_MAX_SECONDS;
+    serve it with threaded workers (see gunicorn.conf.py), not sync ones.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = broker.subscribe(last_event_id)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                event = subscription.get(HEARTBEAT_SECONDS)
+                yield format_sse(event) if event else ': keep-alive\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
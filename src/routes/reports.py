@@ -1,10 +1,16 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import User, db
-from src.models.complaint import Complaint
-from src.models.workforce import WorkforceEntry
+from src.models.complaint import COMPLAINT_FIELDS, Complaint
+from src.models.workforce import WORKFORCE_FIELDS, WorkforceEntry
+from src.models.complaint_rollup import ComplaintDailyRollup
 from src.routes.auth import login_required
+from src.utils.duplicates import DUPLICATE_STATUS
+from src.utils.fields import parse_fields
+from src.utils.http import gzip_response
+from src.utils.sql import count_if, epoch_seconds
 from datetime import datetime, date, timedelta
 from sqlalchemy import func, and_
+from collections import defaultdict
 import json
 
 reports_bp = Blueprint('reports', __name__)
@@ -19,7 +25,7 @@ def get_dashboard_data():
         month_ago = today - timedelta(days=30)
         
         # Complaint statistics
-        total_complaints = Complaint.query.count()
+        total_complaints = Complaint.query.filter(Complaint.status != DUPLICATE_STATUS).count()
         open_complaints = Complaint.query.filter_by(status='Open').count()
         in_progress_complaints = Complaint.query.filter_by(status='In Progress').count()
         resolved_complaints = Complaint.query.filter_by(status='Resolved').count()
@@ -52,7 +58,7 @@ def get_dashboard_data():
             resolution_trend = ((this_week_resolved - prev_week_resolved) / prev_week_resolved) * 100
         
         # Recent complaints
-        recent_complaints = Complaint.query.order_by(
+        recent_complaints = Complaint.with_people(Complaint.query).order_by(
             Complaint.created_at.desc()
         ).limit(5).all()
         
@@ -101,68 +107,47 @@ def get_complaints_summary():
         else:
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
         
-        # Complaints by status
-        status_counts = db.session.query(
-            Complaint.status,
-            func.count(Complaint.id).label('count')
-        ).filter(
-            func.date(Complaint.created_at) >= start_date,
-            func.date(Complaint.created_at) <= end_date
-        ).group_by(Complaint.status).all()
-        
-        # Complaints by priority
-        priority_counts = db.session.query(
-            Complaint.priority,
-            func.count(Complaint.id).label('count')
-        ).filter(
-            func.date(Complaint.created_at) >= start_date,
-            func.date(Complaint.created_at) <= end_date
-        ).group_by(Complaint.priority).all()
-        
-        # Complaints by issue type
-        issue_type_counts = db.session.query(
-            Complaint.issue_type,
-            func.count(Complaint.id).label('count')
-        ).filter(
-            func.date(Complaint.created_at) >= start_date,
-            func.date(Complaint.created_at) <= end_date
-        ).group_by(Complaint.issue_type).all()
+        # Answer from the daily rollup: one small row per (day, status, priority, issue type)
+        rollup_rows = db.session.query(ComplaintDailyRollup).filter(
+            ComplaintDailyRollup.day >= start_date,
+            ComplaintDailyRollup.day <= end_date
+        ).all()
         
-        # Daily complaint trends
-        daily_trends = db.session.query(
-            func.date(Complaint.created_at).label('date'),
-            func.count(Complaint.id).label('count')
-        ).filter(
-            func.date(Complaint.created_at) >= start_date,
-            func.date(Complaint.created_at) <= end_date
-        ).group_by(func.date(Complaint.created_at)).order_by('date').all()
+        status_counts = defaultdict(int)
+        priority_counts = defaultdict(int)
+        issue_type_counts = defaultdict(int)
+        daily_counts = defaultdict(int)
+        resolved_count = 0
+        resolution_seconds = 0
+        duplicate_count = 0
+        
+        for row in rollup_rows:
+            # Repeat reports are counted apart, as in /complaints/stats and the dashboard
+            if row.status == DUPLICATE_STATUS:
+                duplicate_count += row.complaint_count
+                continue
+            status_counts[row.status] += row.complaint_count
+            priority_counts[row.priority] += row.complaint_count
+            issue_type_counts[row.issue_type] += row.complaint_count
+            daily_counts[row.day] += row.complaint_count
+            resolved_count += row.resolved_count
+            resolution_seconds += row.resolution_seconds
         
         # Average resolution time
-        resolved_complaints = Complaint.query.filter(
-            Complaint.resolved_at.isnot(None),
-            func.date(Complaint.created_at) >= start_date,
-            func.date(Complaint.created_at) <= end_date
-        ).all()
-        
-        avg_resolution_hours = 0
-        if resolved_complaints:
-            total_hours = sum([
-                (c.resolved_at - c.created_at).total_seconds() / 3600
-                for c in resolved_complaints
-            ])
-            avg_resolution_hours = total_hours / len(resolved_complaints)
+        avg_resolution_hours = resolution_seconds / resolved_count / 3600 if resolved_count else 0
         
         return jsonify({
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
             },
-            'status_distribution': [{'status': s.status, 'count': s.count} for s in status_counts],
-            'priority_distribution': [{'priority': p.priority, 'count': p.count} for p in priority_counts],
-            'issue_type_distribution': [{'issue_type': i.issue_type, 'count': i.count} for i in issue_type_counts],
-            'daily_trends': [{'date': d.date.isoformat(), 'count': d.count} for d in daily_trends],
+            'status_distribution': [{'status': k, 'count': v} for k, v in status_counts.items() if v],
+            'priority_distribution': [{'priority': k, 'count': v} for k, v in priority_counts.items() if v],
+            'issue_type_distribution': [{'issue_type': k, 'count': v} for k, v in issue_type_counts.items() if v],
+            'daily_trends': [{'date': d.isoformat(), 'count': daily_counts[d]} for d in sorted(daily_counts) if daily_counts[d]],
             'avg_resolution_hours': round(avg_resolution_hours, 2),
-            'total_complaints': sum([s.count for s in status_counts])
+            'total_complaints': sum(status_counts.values()),
+            'duplicates': duplicate_count
         }), 200
         
     except Exception as e:
@@ -199,7 +184,7 @@ def get_workforce_summary():
         daily_attendance = db.session.query(
             WorkforceEntry.shift_date,
             func.count(WorkforceEntry.id).label('total_entries'),
-            func.sum(func.case([(WorkforceEntry.status.in_(['Present', 'Late']), 1)], else_=0)).label('present_count')
+            count_if(WorkforceEntry.status.in_(['Present', 'Late'])).label('present_count')
         ).filter(
             WorkforceEntry.shift_date >= start_date,
             WorkforceEntry.shift_date <= end_date
@@ -209,31 +194,25 @@ def get_workforce_summary():
         dept_attendance = db.session.query(
             User.department,
             func.count(WorkforceEntry.id).label('total_entries'),
-            func.sum(func.case([(WorkforceEntry.status.in_(['Present', 'Late']), 1)], else_=0)).label('present_count')
+            count_if(WorkforceEntry.status.in_(['Present', 'Late'])).label('present_count'),
+            func.coalesce(func.sum(WorkforceEntry.minutes_worked), 0).label('minutes_worked')
         ).join(User, WorkforceEntry.staff_id == User.id).filter(
             WorkforceEntry.shift_date >= start_date,
             WorkforceEntry.shift_date <= end_date
         ).group_by(User.department).all()
         
-        # Average hours worked
-        completed_shifts = WorkforceEntry.query.filter(
+        # Hours worked (completed shifts only) and late arrivals
+        totals = db.session.query(
+            func.avg(WorkforceEntry.minutes_worked).label('avg_minutes'),
+            func.coalesce(func.sum(WorkforceEntry.minutes_worked), 0).label('total_minutes'),
+            count_if(WorkforceEntry.status == 'Late').label('late_count')
+        ).filter(
             WorkforceEntry.shift_date >= start_date,
-            WorkforceEntry.shift_date <= end_date,
-            WorkforceEntry.check_in_time.isnot(None),
-            WorkforceEntry.check_out_time.isnot(None)
-        ).all()
-        
-        avg_hours = 0
-        if completed_shifts:
-            total_hours = sum([entry.calculate_hours_worked() for entry in completed_shifts])
-            avg_hours = total_hours / len(completed_shifts)
+            WorkforceEntry.shift_date <= end_date
+        ).one()
         
-        # Late arrivals
-        late_count = WorkforceEntry.query.filter(
-            WorkforceEntry.shift_date >= start_date,
-            WorkforceEntry.shift_date <= end_date,
-            WorkforceEntry.status == 'Late'
-        ).count()
+        avg_hours = float(totals.avg_minutes or 0) / 60
+        late_count = totals.late_count
         
         return jsonify({
             'period': {
@@ -251,15 +230,154 @@ def get_workforce_summary():
                 'department': d.department,
                 'total_entries': d.total_entries,
                 'present_count': d.present_count or 0,
-                'attendance_rate': round((d.present_count or 0) / d.total_entries * 100, 1) if d.total_entries > 0 else 0
+                'attendance_rate': round((d.present_count or 0) / d.total_entries * 100, 1) if d.total_entries > 0 else 0,
+                'hours_worked': round(d.minutes_worked / 60, 2)
             } for d in dept_attendance],
             'avg_hours_worked': round(avg_hours, 2),
+            'total_hours_worked': round(totals.total_minutes / 60, 2),
             'late_arrivals': late_count
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+TIMESERIES_MAX_DAYS = 366
+TIMESERIES_GROUPS = ('department', 'staff')
+TIMESERIES_COUNTS = ('present', 'late', 'absent')
+
+def _delta_encode(values):
+    """First value, then the difference from the previous one"""
+    previous = 0
+    encoded = []
+    for value in values:
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+@reports_bp.route('/workforce/timeseries', methods=['GET'])
+@login_required
+def get_workforce_timeseries():
+    """Daily attendance per department or staff member as columnar arrays.
+
+    Query: start_date, end_date (default the last 30 days, at most
+    TIMESERIES_MAX_DAYS), group_by=department|staff, department, staff_id,
+    format=json|compact. json aligns every series with one dates array.
+    compact lists only days with entries: days are offsets from start_date
+    and, like every value array, delta-encoded (the first value is absolute,
+    each later one is the change from the one before); averages are whole
+    minutes. Built from a single grouped query.
+    """
+    try:
+        try:
+            end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() \
+                if request.args.get('end_date') else date.today()
+            start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() \
+                if request.args.get('start_date') else end_date - timedelta(days=30)
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        if end_date < start_date:
+            return jsonify({'error': 'end_date must not be before start_date'}), 400
+        days = (end_date - start_date).days + 1
+        if days > TIMESERIES_MAX_DAYS:
+            return jsonify({'error': f'A time series may cover at most {TIMESERIES_MAX_DAYS} days'}), 400
+        
+        group_by = request.args.get('group_by', 'department')
+        if group_by not in TIMESERIES_GROUPS:
+            return jsonify({'error': f'group_by must be one of {", ".join(TIMESERIES_GROUPS)}'}), 400
+        compact = request.args.get('format', 'json') == 'compact'
+        
+        if group_by == 'department':
+            keys = [User.department]
+            group = [User.department]
+        else:
+            # Name and staff number depend on the grouped primary key
+            keys = [User.id, User.name, User.staff_number]
+            group = [User.id]
+        # Day number within the range, so no date is parsed per row
+        day_offset = db.cast(func.round(
+            (epoch_seconds(WorkforceEntry.shift_date) - epoch_seconds(db.literal(start_date, db.Date))) / 86400
+        ), db.Integer)
+        
+        stmt = db.select(
+            *keys,
+            day_offset,
+            count_if(WorkforceEntry.status.in_(['Present', 'Late'])),
+            count_if(WorkforceEntry.status == 'Late'),
+            count_if(WorkforceEntry.status == 'Absent'),
+            func.avg(WorkforceEntry.minutes_worked)
+        ).join(User, WorkforceEntry.staff_id == User.id).where(
+            WorkforceEntry.shift_date >= start_date,
+            WorkforceEntry.shift_date <= end_date
+        )
+        if request.args.get('department'):
+            stmt = stmt.where(User.department == request.args['department'])
+        if request.args.get('staff_id'):
+            stmt = stmt.where(User.id == request.args.get('staff_id', type=int))
+        rows = db.session.execute(
+            stmt.group_by(*group, WorkforceEntry.shift_date).order_by(*group, WorkforceEntry.shift_date)
+        ).all()
+        
+        # Rows arrive ordered by series, then day: collect each series' columns
+        width = len(keys)
+        series = []
+        current = None
+        for row in rows:
+            key = tuple(row[:width])
+            if key != current:
+                current = key
+                days_seen, present, late, absent, avg_minutes = columns = ([], [], [], [], [])
+                series.append((key, columns))
+            day, present_count, late_count, absent_count, minutes = row[width:]
+            days_seen.append(day)
+            present.append(present_count)
+            late.append(late_count)
+            absent.append(absent_count)
+            avg_minutes.append(round(minutes) if minutes is not None else 0)
+        
+        result = []
+        for key, columns in series:
+            if group_by == 'department':
+                item = {'department': key[0]}
+            else:
+                item = {'staff_id': key[0], 'staff_name': key[1], 'staff_number': key[2]}
+            days_seen, counts, avg_minutes = columns[0], columns[1:4], columns[4]
+            if compact:
+                item['days'] = _delta_encode(days_seen)
+                for name, values in zip(TIMESERIES_COUNTS, counts):
+                    item[name] = _delta_encode(values)
+                item['avg_minutes'] = _delta_encode(avg_minutes)
+            else:
+                # Spread onto the full date range; days without entries are 0
+                for name, values in zip(TIMESERIES_COUNTS, counts):
+                    dense = [0] * days
+                    for day, value in zip(days_seen, values):
+                        dense[day] = value
+                    item[name] = dense
+                avg_hours = [0] * days
+                for day, value in zip(days_seen, avg_minutes):
+                    avg_hours[day] = round(value / 60, 2)
+                item['avg_hours'] = avg_hours
+            result.append(item)
+        
+        response = {
+            'period': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            },
+            'group_by': group_by,
+            'format': 'compact' if compact else 'json',
+            'series': result
+        }
+        if compact:
+            response['encoding'] = 'delta'
+        else:
+            response['dates'] = [(start_date + timedelta(days=day)).isoformat() for day in range(days)]
+        # Long arrays of small repeated numbers compress about six-fold
+        return gzip_response(jsonify(response))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @reports_bp.route('/performance', methods=['GET'])
 @login_required
 def get_performance_report():
@@ -341,8 +459,21 @@ def export_complaints():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         format_type = request.args.get('format', 'json')  # json, csv
+        try:
+            fields = parse_fields(request.args.get('fields'), COMPLAINT_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         query = Complaint.query
+        if format_type == 'csv':
+            # Only the CSV columns are selected
+            query = query.options(db.load_only(
+                Complaint.complaint_id, Complaint.customer_name, Complaint.customer_phone,
+                Complaint.issue_type, Complaint.status, Complaint.priority,
+                Complaint.created_at, Complaint.resolved_at
+            ))
+        else:
+            query = Complaint.with_people(query, fields)
         
         if start_date:
             start_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -383,7 +514,7 @@ def export_complaints():
             # Return JSON format
             return jsonify({
                 'format': 'json',
-                'data': [complaint.to_dict() for complaint in complaints],
+                'data': [complaint.to_dict(fields) for complaint in complaints],
                 'count': len(complaints),
                 'exported_at': datetime.now().isoformat()
             }), 200
@@ -398,8 +529,18 @@ def export_workforce():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         format_type = request.args.get('format', 'json')
+        try:
+            fields = parse_fields(request.args.get('fields'), WORKFORCE_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         query = WorkforceEntry.query
+        if format_type == 'csv':
+            # Only the CSV columns are selected
+            fields = ['staff_number', 'staff_name', 'shift_date', 'check_in_time', 'check_out_time', 'status', 'hours_worked']
+        query = WorkforceEntry.load_fields(query, fields).options(
+            db.joinedload(WorkforceEntry.staff_member).load_only(User.name, User.staff_number)
+        )
         
         if start_date:
             start_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -424,7 +565,7 @@ def export_workforce():
                     entry.check_in_time.strftime('%H:%M') if entry.check_in_time else '',
                     entry.check_out_time.strftime('%H:%M') if entry.check_out_time else '',
                     entry.status,
-                    str(round(entry.calculate_hours_worked(), 2))
+                    str(round((entry.minutes_worked or 0) / 60, 2))
                 ]
                 csv_data.append(row)
             
@@ -437,7 +578,7 @@ def export_workforce():
         else:
             return jsonify({
                 'format': 'json',
-                'data': [entry.to_dict() for entry in entries],
+                'data': [entry.to_dict(fields) for entry in entries],
                 'count': len(entries),
                 'exported_at': datetime.now().isoformat()
             }), 200
@@ -1,8 +1,18 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import User, db
-from src.models.workforce import WorkforceEntry
-from src.routes.auth import login_required
-from datetime import datetime, date, time, timedelta
+from src.models.workforce import WORKFORCE_FIELDS, WorkforceEntry
+from src.models.workforce_sync import WorkforceSyncEvent
+from src.models.workforce_task import TASK_COMPLETED, TASK_PENDING, WorkforceTask, task_text
+from src.models.complaint import Complaint
+from src.routes.auth import admin_required, login_required
+from src.utils.assignment import assignment_engine
+from src.utils.events import attendance_event, broker
+from src.utils.pagination import clamp_limit, keyset_paginate
+from src.utils.fields import parse_fields
+from src.utils.geo import parse_gps
+from src.utils.sql import count_if, dialect_insert
+from src.utils.http import collection_etag, is_not_modified, not_modified_response, page_etag
+from datetime import datetime, date, time, timedelta, timezone
 from sqlalchemy import func
 
 workforce_bp = Blueprint('workforce', __name__)
@@ -16,6 +26,10 @@ def get_workforce_entries():
         shift_date = request.args.get('date')
         status = request.args.get('status')
         staff_id = request.args.get('staff_id')
+        try:
+            fields = parse_fields(request.args.get('fields'), WORKFORCE_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         query = WorkforceEntry.query
         
@@ -36,8 +50,43 @@ def get_workforce_entries():
         if staff_id:
             query = query.filter(WorkforceEntry.staff_id == staff_id)
         
+        query = query.join(User).options(db.contains_eager(WorkforceEntry.staff_member))
+        
+        # Cursor mode: seek on (User.name, id) instead of COUNT + OFFSET
+        if 'cursor' in request.args or 'limit' in request.args:
+            query = WorkforceEntry.load_fields(query, fields, extra_columns=['updated_at'])
+            try:
+                entries, next_cursor, total = keyset_paginate(
+                    query,
+                    [User.name, WorkforceEntry.id],
+                    lambda e: (e.staff_member.name, e.id),
+                    cursor=request.args.get('cursor'),
+                    limit=request.args.get('limit', 20, type=int),
+                    with_total=request.args.get('include_total') == 'true'
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            etag = page_etag(entries, next_cursor, total)
+            if is_not_modified(etag):
+                return not_modified_response(etag)
+            
+            result = {
+                'entries': [entry.to_dict(fields) for entry in entries],
+                'next_cursor': next_cursor,
+                'limit': clamp_limit(request.args.get('limit', 20, type=int))
+            }
+            if total is not None:
+                result['total'] = total
+            return jsonify(result), 200, {'ETag': f'"{etag}"'}
+        
+        etag = collection_etag(query, WorkforceEntry.updated_at)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        query = WorkforceEntry.load_fields(query, fields)
+        
         # Order by staff name
-        query = query.join(User).order_by(User.name)
+        query = query.order_by(User.name)
         
         # Paginate
         entries = query.paginate(
@@ -45,12 +94,12 @@ def get_workforce_entries():
         )
         
         return jsonify({
-            'entries': [entry.to_dict() for entry in entries.items],
+            'entries': [entry.to_dict(fields) for entry in entries.items],
             'total': entries.total,
             'pages': entries.pages,
             'current_page': page,
             'per_page': per_page
-        }), 200
+        }), 200, {'ETag': f'"{etag}"'}
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -116,6 +165,91 @@ def create_workforce_entry():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+ROSTER_MAX_DAYS = 92
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+@workforce_bp.route('/roster', methods=['POST'])
+@admin_required
+def generate_roster():
+    """Schedule every matching staff member on each pattern day of a date range.
+
+    Body: {"start_date", "end_date", "weekdays": ["mon", ...], "department",
+    "role", "staff_ids", "status", "work_location"}. Each day is one
+    INSERT ... SELECT from users that skips existing (staff_id, shift_date)
+    entries with NOT EXISTS, all in one transaction.
+    """
+    try:
+        data = request.get_json() or {}
+        try:
+            start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'start_date and end_date are required as YYYY-MM-DD'}), 400
+        if end_date < start_date:
+            return jsonify({'error': 'end_date must not be before start_date'}), 400
+        if (end_date - start_date).days >= ROSTER_MAX_DAYS:
+            return jsonify({'error': f'A roster may cover at most {ROSTER_MAX_DAYS} days'}), 400
+        
+        weekdays = data.get('weekdays') or WEEKDAYS[:5]
+        if not isinstance(weekdays, list) or not all(isinstance(day, str) for day in weekdays):
+            return jsonify({'error': 'weekdays must be a list of day names'}), 400
+        weekdays = [day.lower()[:3] for day in weekdays]
+        if not set(weekdays) <= set(WEEKDAYS):
+            return jsonify({'error': f'weekdays must be drawn from {", ".join(WEEKDAYS)}'}), 400
+        pattern = {WEEKDAYS.index(day) for day in weekdays}
+        
+        staff_ids = data.get('staff_ids')
+        if staff_ids is not None and not (
+            isinstance(staff_ids, list)
+            and all(isinstance(i, int) and not isinstance(i, bool) for i in staff_ids)
+        ):
+            return jsonify({'error': 'staff_ids must be a list of integers'}), 400
+        
+        staff_filters = [User.is_active == True]
+        if data.get('department'):
+            staff_filters.append(User.department == data['department'])
+        if data.get('role'):
+            staff_filters.append(User.role == data['role'])
+        if staff_ids:
+            staff_filters.append(User.id.in_(staff_ids))
+        
+        table = WorkforceEntry.__table__
+        now = datetime.utcnow()
+        created = 0
+        days = 0
+        day = start_date
+        while day <= end_date:
+            if day.weekday() in pattern:
+                existing = db.select(table.c.id).where(
+                    table.c.staff_id == User.id, table.c.shift_date == day
+                )
+                shifts = db.select(
+                    User.id,
+                    db.literal(day, db.Date),
+                    db.literal(data.get('status', 'Scheduled')),
+                    db.literal(data.get('work_location'), db.String),
+                    db.literal(now, db.DateTime),
+                    db.literal(now, db.DateTime)
+                ).where(*staff_filters, ~existing.exists())
+                result = db.session.execute(table.insert().from_select(
+                    ['staff_id', 'shift_date', 'status', 'work_location', 'created_at', 'updated_at'], shifts
+                ))
+                created += result.rowcount
+                days += 1
+            day += timedelta(days=1)
+        
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Roster generated successfully',
+            'created': created,
+            'days': days
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @workforce_bp.route('/entries/<int:entry_id>', methods=['PUT'])
 @login_required
 def update_workforce_entry(entry_id):
@@ -173,42 +307,171 @@ def update_workforce_entry(entry_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@workforce_bp.route('/check-in', methods=['POST'])
+@workforce_bp.route('/entries/<int:entry_id>/tasks', methods=['POST'])
 @login_required
-def check_in():
-    """Allow staff to check in for their shift"""
+def assign_task(entry_id):
+    """Add one task to a shift. Body: {"task", "complaint_id"}"""
     try:
-        data = request.get_json()
-        staff_id = session.get('user_id')  # Use current logged-in user
-        today = date.today()
+        entry = db.session.get(WorkforceEntry, entry_id)
+        if not entry:
+            return jsonify({'error': 'Workforce entry not found'}), 404
+        data = request.get_json() or {}
+        if not data.get('task'):
+            return jsonify({'error': 'task is required'}), 400
+        complaint_id = data.get('complaint_id')
+        if complaint_id is not None and db.session.get(Complaint, complaint_id) is None:
+            return jsonify({'error': 'Complaint not found'}), 400
+        
+        task = WorkforceTask(entry_id=entry.id, task=task_text(data['task']), complaint_id=complaint_id)
+        db.session.add(task)
+        entry.touch()
+        db.session.commit()
         
-        # Find or create workforce entry for today
-        entry = WorkforceEntry.query.filter_by(
-            staff_id=staff_id,
-            shift_date=today
-        ).first()
+        return jsonify({
+            'message': 'Task assigned successfully',
+            'task': task.to_dict()
+        }), 201
         
-        if not entry:
-            # Create new entry
-            entry = WorkforceEntry(
-                staff_id=staff_id,
-                shift_date=today,
-                status='Present'
-            )
-            db.session.add(entry)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@workforce_bp.route('/tasks/<int:task_id>/complete', methods=['POST'])
+@login_required
+def complete_task(task_id):
+    """Mark a task completed; completing it again keeps the first time"""
+    try:
+        task = db.session.get(WorkforceTask, task_id)
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
         
-        # Set check-in details
-        entry.check_in_time = datetime.now().time()
-        entry.check_in_location = data.get('location')
-        entry.check_in_gps = data.get('gps_coordinates')
-        entry.status = 'Present'
+        if task.status != TASK_COMPLETED:
+            task.complete()
+            task.entry.touch(task.completed_at)
+            db.session.commit()
         
-        # Check if late (assuming 8:00 AM is standard start time)
-        standard_start = time(8, 0)
-        if entry.check_in_time > standard_start:
-            entry.status = 'Late'
+        return jsonify({
+            'message': 'Task completed successfully',
+            'task': task.to_dict()
+        }), 200
         
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@workforce_bp.route('/tasks/outstanding', methods=['GET'])
+@login_required
+def get_outstanding_tasks():
+    """Pending tasks on a day's shifts per department, from one grouped query"""
+    try:
+        target_date = request.args.get('date')
+        if target_date:
+            try:
+                date_obj = datetime.strptime(target_date, '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        else:
+            date_obj = date.today()
+        
+        query = db.session.query(
+            User.department,
+            func.count(WorkforceTask.id).label('outstanding'),
+            func.count(WorkforceTask.complaint_id).label('for_complaints'),
+            func.count(func.distinct(WorkforceEntry.staff_id)).label('staff'),
+            func.min(WorkforceTask.created_at).label('oldest_assigned_at')
+        ).select_from(WorkforceEntry).join(
+            WorkforceTask, WorkforceTask.entry_id == WorkforceEntry.id
+        ).join(
+            User, WorkforceEntry.staff_id == User.id
+        ).filter(
+            WorkforceEntry.shift_date == date_obj,
+            WorkforceTask.status == TASK_PENDING
+        )
+        if request.args.get('department'):
+            query = query.filter(User.department == request.args['department'])
+        rows = query.group_by(User.department).order_by(User.department).all()
+        
+        departments = [{
+            'department': row.department,
+            'outstanding': row.outstanding,
+            'for_complaints': row.for_complaints,
+            'staff': row.staff,
+            'oldest_assigned_at': row.oldest_assigned_at.isoformat() if row.oldest_assigned_at else None
+        } for row in rows]
+        
+        return jsonify({
+            'date': date_obj.isoformat(),
+            'outstanding': sum(row.outstanding for row in rows),
+            'departments': departments
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Check-ins after this are Late
+STANDARD_START = time(8, 0)
+
+def _upsert_shift(staff_id, shift_date, changes, now):
+    """Merge one day's check-in/check-out changes into its entry with a single upsert.
+
+    The earliest check-in and the latest check-out win, so applying events
+    again, in any order, or racing another request gives the same row.
+    Returns the entry as stored.
+    """
+    table = WorkforceEntry.__table__
+    values = {'staff_id': staff_id, 'shift_date': shift_date, 'status': 'Scheduled',
+              'created_at': now, 'updated_at': now}
+    check_in = changes.get('check_in')
+    check_out = changes.get('check_out')
+    if check_in:
+        lat, lon = parse_gps(check_in['gps'])
+        values.update(
+            check_in_time=check_in['time'], check_in_gps=check_in['gps'],
+            check_in_location=check_in['location'], check_in_latitude=lat, check_in_longitude=lon,
+            status='Late' if check_in['time'] > STANDARD_START else 'Present'
+        )
+    if check_out:
+        values.update(
+            check_out_time=check_out['time'], check_out_gps=check_out['gps'],
+            check_out_location=check_out['location']
+        )
+
+    stmt = dialect_insert(WorkforceEntry).values(values)
+    set_ = {'updated_at': stmt.excluded.updated_at}
+    if check_in:
+        earlier = db.or_(table.c.check_in_time.is_(None), stmt.excluded.check_in_time < table.c.check_in_time)
+        for column in ('check_in_time', 'check_in_gps', 'check_in_location',
+                       'check_in_latitude', 'check_in_longitude', 'status'):
+            set_[column] = db.case((earlier, stmt.excluded[column]), else_=table.c[column])
+    if check_out:
+        later = db.or_(table.c.check_out_time.is_(None), stmt.excluded.check_out_time > table.c.check_out_time)
+        for column in ('check_out_time', 'check_out_gps', 'check_out_location'):
+            set_[column] = db.case((later, stmt.excluded[column]), else_=table.c[column])
+
+    return db.session.scalars(
+        stmt.on_conflict_do_update(index_elements=['staff_id', 'shift_date'], set_=set_)
+        .returning(WorkforceEntry)
+    ).one()
+
+@workforce_bp.route('/check-in', methods=['POST'])
+@login_required
+def check_in():
+    """Allow staff to check in for their shift"""
+    try:
+        data = request.get_json() or {}
+        staff_id = session.get('user_id')  # Use current logged-in user
+        # One upsert on (staff_id, shift_date): retries and double taps keep the first check-in
+        entry = _upsert_shift(staff_id, date.today(), {'check_in': {
+            'time': datetime.now().time(),
+            'gps': data.get('gps_coordinates'),
+            'location': data.get('location')
+        }}, datetime.utcnow())
+        # Commit straight away: under the rush the write lock is the bottleneck
         db.session.commit()
+        assignment_engine.checked_in(
+            staff_id, session.get('user_role'), entry.check_in_latitude, entry.check_in_longitude
+        )
+        broker.publish('attendance.check_in', attendance_event(entry))
         
         return jsonify({
             'message': 'Check-in successful',
@@ -216,6 +479,7 @@ def check_in():
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @workforce_bp.route('/check-out', methods=['POST'])
@@ -223,27 +487,45 @@ def check_in():
 def check_out():
     """Allow staff to check out from their shift"""
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         staff_id = session.get('user_id')
         today = date.today()
-        
-        entry = WorkforceEntry.query.filter_by(
-            staff_id=staff_id,
-            shift_date=today
-        ).first()
+        check_out_time = datetime.now().time()
+        
+        # A single conditional UPDATE; only the first check-out of the day matches
+        entry = db.session.scalars(
+            db.update(WorkforceEntry)
+            .where(
+                WorkforceEntry.staff_id == staff_id,
+                WorkforceEntry.shift_date == today,
+                WorkforceEntry.check_in_time.isnot(None),
+                WorkforceEntry.check_out_time.is_(None)
+            )
+            .values(
+                check_out_time=check_out_time,
+                check_out_location=data.get('location'),
+                check_out_gps=data.get('gps_coordinates'),
+                minutes_worked=WorkforceEntry.minutes_worked_expression(db.literal(check_out_time, db.Time)),
+                updated_at=datetime.utcnow()
+            )
+            .returning(WorkforceEntry)
+        ).one_or_none()
         
         if not entry:
-            return jsonify({'error': 'No check-in record found for today'}), 404
-        
-        if entry.check_out_time:
+            existing = db.session.query(
+                WorkforceEntry.check_in_time, WorkforceEntry.check_out_time
+            ).filter_by(
+                staff_id=staff_id,
+                shift_date=today
+            ).first()
+            db.session.rollback()
+            if existing is None or existing.check_in_time is None:
+                return jsonify({'error': 'No check-in record found for today'}), 404
             return jsonify({'error': 'Already checked out for today'}), 400
         
-        # Set check-out details
-        entry.check_out_time = datetime.now().time()
-        entry.check_out_location = data.get('location')
-        entry.check_out_gps = data.get('gps_coordinates')
-        
         db.session.commit()
+        assignment_engine.checked_out(staff_id)
+        broker.publish('attendance.check_out', attendance_event(entry))
         
         return jsonify({
             'message': 'Check-out successful',
@@ -251,6 +533,202 @@ def check_out():
         }), 200
         
     except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+SYNC_MAX_EVENTS = 500
+SYNC_EVENT_TYPES = ('check_in', 'check_out', 'task_completed')
+# Device clocks may run slightly ahead; events older than this are refused
+SYNC_CLOCK_SKEW = timedelta(minutes=5)
+SYNC_MAX_AGE = timedelta(days=31)
+
+def _parse_client_time(value):
+    """Device ISO 8601 timestamp as naive server-local time, like datetime.now()"""
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if moment.tzinfo:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+def _sync_event_error(event, moment, now):
+    if event.get('type') not in SYNC_EVENT_TYPES:
+        return f'type must be one of {", ".join(SYNC_EVENT_TYPES)}'
+    if moment is None:
+        return 'timestamp must be ISO 8601'
+    if moment > now + SYNC_CLOCK_SKEW:
+        return 'timestamp is in the future'
+    if moment < now - SYNC_MAX_AGE:
+        return 'timestamp is too old to sync'
+    if event['type'] == 'task_completed' and not event.get('task'):
+        return 'task is required'
+    return None
+
+@workforce_bp.route('/sync', methods=['POST'])
+@login_required
+def sync_events():
+    """Apply a batch of check-ins, check-outs and task completions queued
+    offline, using the device's timestamps.
+
+    Body: {"events": [{"id", "type", "timestamp", "gps_coordinates",
+    "location", "task"}]}. Event ids are applied once per staff member, so a
+    batch can be resent safely. All changes commit in one transaction.
+    """
+    try:
+        data = request.get_json() or {}
+        events = data.get('events')
+        if not isinstance(events, list) or not events:
+            return jsonify({'error': 'events must be a non-empty list'}), 400
+        if len(events) > SYNC_MAX_EVENTS:
+            return jsonify({'error': f'At most {SYNC_MAX_EVENTS} events per sync'}), 400
+        
+        staff_id = session['user_id']
+        now = datetime.now()
+        results = [None] * len(events)
+        
+        client_ids = {str(event['id']) for event in events if isinstance(event, dict) and event.get('id')}
+        # Only applied events are final; a rejected one (say, a check-out sent
+        # before its check-in) is evaluated again when it is resent
+        recorded = {
+            row.client_event_id: row for row in WorkforceSyncEvent.query.filter(
+                WorkforceSyncEvent.staff_id == staff_id,
+                WorkforceSyncEvent.client_event_id.in_(client_ids),
+                WorkforceSyncEvent.outcome == 'applied'
+            )
+        }
+        
+        pending = []
+        batch_ids = set()
+        for index, event in enumerate(events):
+            if not isinstance(event, dict) or not event.get('id'):
+                results[index] = {'id': None, 'outcome': 'rejected', 'error': 'id is required'}
+                continue
+            client_id = str(event['id'])[:64]
+            if client_id in recorded:
+                results[index] = recorded[client_id].to_result()
+                continue
+            if client_id in batch_ids:
+                results[index] = {'id': client_id, 'outcome': 'duplicate'}
+                continue
+            batch_ids.add(client_id)
+            try:
+                moment = _parse_client_time(event.get('timestamp'))
+            except (TypeError, ValueError):
+                moment = None
+            results[index] = {'id': client_id, 'outcome': 'applied'}
+            error = _sync_event_error(event, moment, now)
+            if error:
+                results[index].update(outcome='rejected', error=error)
+            pending.append((moment, index, event))
+        
+        # Replay in device order; a check-out after midnight closes the previous day's shift
+        pending.sort(key=lambda item: (item[0] or now, item[1]))
+        days = {moment.date() for moment, _, _ in pending if moment}
+        days |= {day - timedelta(days=1) for day in days}
+        check_ins = dict(db.session.query(WorkforceEntry.shift_date, WorkforceEntry.check_in_time).filter(
+            WorkforceEntry.staff_id == staff_id,
+            WorkforceEntry.shift_date.in_(days),
+            WorkforceEntry.check_in_time.isnot(None)
+        ))
+        
+        shifts = {}
+        shift_dates = {}
+        for moment, index, event in pending:
+            result = results[index]
+            if result['outcome'] != 'applied':
+                continue
+            day = moment.date()
+            change = {'time': moment.time(), 'gps': event.get('gps_coordinates'), 'location': event.get('location')}
+            if event['type'] == 'check_in':
+                shifts.setdefault(day, {}).setdefault('check_in', change)
+                check_ins[day] = min(check_ins.get(day, change['time']), change['time'])
+            elif event['type'] == 'check_out':
+                if not (day in check_ins and check_ins[day] <= change['time']):
+                    day -= timedelta(days=1)
+                if day not in check_ins:
+                    result.update(outcome='rejected', error='No check-in found for this check-out')
+                    continue
+                shifts.setdefault(day, {})['check_out'] = change
+            else:
+                shifts.setdefault(day, {}).setdefault('tasks', []).append((event['task'], moment))
+            shift_dates[index] = day
+            result['shift_date'] = day.isoformat()
+        
+        utcnow = datetime.utcnow()
+        synced = [_upsert_shift(staff_id, day, changes, utcnow) for day, changes in sorted(shifts.items())]
+        if synced:
+            # The upserts bypass the ORM hook that keeps minutes_worked current
+            db.session.execute(
+                db.update(WorkforceEntry)
+                .where(WorkforceEntry.id.in_([row.id for row in synced]))
+                .values(minutes_worked=WorkforceEntry.minutes_worked_expression())
+                .execution_options(synchronize_session=False)
+            )
+        
+        entry_ids = {row.shift_date: row.id for row in synced}
+        completions = {}
+        for day, changes in shifts.items():
+            for task, moment in changes.get('tasks', []):
+                # Device time, stored in UTC like the other timestamps
+                completed_at = moment.astimezone(timezone.utc).replace(tzinfo=None)
+                completions.setdefault((entry_ids[day], task_text(task)), completed_at)
+        if completions:
+            existing = WorkforceTask.query.filter(
+                WorkforceTask.entry_id.in_({entry_id for entry_id, _ in completions}),
+                WorkforceTask.task.in_({task for _, task in completions})
+            ).order_by(WorkforceTask.id)
+            for task in existing:
+                completed_at = completions.pop((task.entry_id, task.task), None)
+                if completed_at:
+                    task.complete(completed_at)
+            # Tasks done without being assigned first
+            db.session.add_all(
+                WorkforceTask(entry_id=entry_id, task=task, status=TASK_COMPLETED, completed_at=completed_at)
+                for (entry_id, task), completed_at in completions.items()
+            )
+        
+        ledger = [{
+            'staff_id': staff_id,
+            'client_event_id': results[index]['id'],
+            'event_type': str(event.get('type'))[:30],
+            'occurred_at': moment,
+            'shift_date': shift_dates.get(index),
+            'outcome': results[index]['outcome'],
+            'error': results[index].get('error'),
+            'received_at': utcnow
+        } for moment, index, event in pending if results[index]['outcome'] == 'applied']
+        if ledger:
+            ledger_table = WorkforceSyncEvent.__table__
+            stmt = dialect_insert(ledger_table).values(ledger)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['staff_id', 'client_event_id'],
+                set_={column: stmt.excluded[column] for column in
+                      ('event_type', 'occurred_at', 'shift_date', 'outcome', 'error', 'received_at')},
+                # Ledger rows rejected before only-applied events were recorded
+                where=ledger_table.c.outcome != 'applied'
+            ))
+        db.session.commit()
+        
+        for row in synced:
+            if row.shift_date == date.today():
+                if row.check_out_time:
+                    assignment_engine.checked_out(staff_id)
+                elif row.check_in_time:
+                    assignment_engine.checked_in(
+                        staff_id, session.get('user_role'), row.check_in_latitude, row.check_in_longitude
+                    )
+            broker.publish(
+                'attendance.check_out' if row.check_out_time else 'attendance.check_in', attendance_event(row)
+            )
+        
+        outcomes = [result['outcome'] for result in results]
+        return jsonify({
+            'applied': outcomes.count('applied'),
+            'duplicates': outcomes.count('duplicate'),
+            'rejected': outcomes.count('rejected'),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @workforce_bp.route('/stats', methods=['GET'])
@@ -266,45 +744,31 @@ def get_workforce_stats():
         else:
             date_obj = date.today()
         
-        # Total staff count
-        total_staff = User.query.filter_by(is_active=True, role='Staff').count()
-        
-        # Today's attendance
-        present_count = WorkforceEntry.query.filter(
-            WorkforceEntry.shift_date == date_obj,
-            WorkforceEntry.status.in_(['Present', 'Late'])
-        ).count()
-        
-        absent_count = WorkforceEntry.query.filter(
-            WorkforceEntry.shift_date == date_obj,
-            WorkforceEntry.status == 'Absent'
-        ).count()
-        
-        on_leave_count = WorkforceEntry.query.filter(
-            WorkforceEntry.shift_date == date_obj,
-            WorkforceEntry.status == 'On Leave'
-        ).count()
+        total_staff_query = db.select(func.count(User.id)).where(
+            User.is_active == True, User.role == 'Staff'
+        ).scalar_subquery()
+        
+        # Every counter and the average completed shift length in one pass
+        stats = db.session.query(
+            total_staff_query.label('total_staff'),
+            count_if(WorkforceEntry.status.in_(['Present', 'Late'])).label('present'),
+            count_if(WorkforceEntry.status == 'Absent').label('absent'),
+            count_if(WorkforceEntry.status == 'On Leave').label('on_leave'),
+            count_if(WorkforceEntry.status == 'Late').label('late'),
+            func.avg(WorkforceEntry.minutes_worked).label('avg_minutes')
+        ).filter(WorkforceEntry.shift_date == date_obj).one()
+        
+        total_staff = stats.total_staff
+        present_count = stats.present
+        absent_count = stats.absent
+        on_leave_count = stats.on_leave
+        late_count = stats.late
         
         # Calculate attendance percentage
         attendance_percentage = (present_count / total_staff * 100) if total_staff > 0 else 0
         
-        # Late arrivals
-        late_count = WorkforceEntry.query.filter(
-            WorkforceEntry.shift_date == date_obj,
-            WorkforceEntry.status == 'Late'
-        ).count()
-        
         # Average hours worked (for completed shifts)
-        completed_entries = WorkforceEntry.query.filter(
-            WorkforceEntry.shift_date == date_obj,
-            WorkforceEntry.check_in_time.isnot(None),
-            WorkforceEntry.check_out_time.isnot(None)
-        ).all()
-        
-        avg_hours = 0
-        if completed_entries:
-            total_hours = sum([entry.calculate_hours_worked() for entry in completed_entries])
-            avg_hours = total_hours / len(completed_entries)
+        avg_hours = float(stats.avg_minutes or 0) / 60
         
         return jsonify({
             'date': date_obj.isoformat(),
@@ -373,6 +837,10 @@ def get_my_schedule():
         staff_id = session.get('user_id')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        try:
+            fields = parse_fields(request.args.get('fields'), WORKFORCE_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         query = WorkforceEntry.query.filter_by(staff_id=staff_id)
         
@@ -400,11 +868,16 @@ def get_my_schedule():
                 WorkforceEntry.shift_date <= end_of_week
             )
         
-        entries = query.order_by(WorkforceEntry.shift_date).all()
+        etag = collection_etag(query, WorkforceEntry.updated_at)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        query = WorkforceEntry.load_fields(query, fields, extra_columns=['shift_date'])
+        entries = query.options(db.joinedload(WorkforceEntry.staff_member)).order_by(WorkforceEntry.shift_date).all()
         
         return jsonify({
-            'schedule': [entry.to_dict() for entry in entries]
-        }), 200
+            'schedule': [entry.to_dict(fields) for entry in entries]
+        }), 200, {'ETag': f'"{etag}"'}
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,178 @@
+from src.models.user import User, db
+from src.models.complaint import Complaint
+from src.models.workforce import WorkforceEntry
+from src.utils.geo import CELL_DEGREES, KM_PER_DEGREE, haversine_km
+from src.utils.sla import OPEN_STATUSES
+from datetime import date
+from sqlalchemy import func
+import math
+import threading
+import time
+
+# One open complaint weighs as much as this many km of travel
+LOAD_PENALTY_KM = 5.0
+# Give up on the ring search beyond roughly this many cells (~220 km)
+MAX_RING = 20
+# Rebuild from the database this often so all workers converge
+REBUILD_SECONDS = 300
+
+class _Staff:
+    __slots__ = ('staff_id', 'role', 'load', 'lat', 'lon', 'cell')
+
+    def __init__(self, staff_id, role, load=0, lat=None, lon=None):
+        self.staff_id = staff_id
+        self.role = role
+        self.load = load
+        self.lat = lat
+        self.lon = lon
+        self.cell = _cell_key(lat, lon) if lat is not None and lon is not None else None
+
+def _cell_key(lat, lon):
+    return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES)
+
+def _ring_cells(row0, col0, ring):
+    """Cells on the square ring at Chebyshev distance ring from (row0, col0)"""
+    if ring == 0:
+        yield row0, col0
+        return
+    for col in range(col0 - ring, col0 + ring + 1):
+        yield row0 - ring, col
+        yield row0 + ring, col
+    for row in range(row0 - ring + 1, row0 + ring):
+        yield row, col0 - ring
+        yield row, col0 + ring
+
+class AssignmentEngine:
+    """In-memory view of checked-in staff, their open-complaint load and last
+    known position, used to pick an assignee without touching the database.
+
+    Route handlers report check-ins, check-outs and assignments as they
+    happen. The view is rebuilt from the database every REBUILD_SECONDS,
+    after a restart, and whenever invalidate() is called.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._staff = {}
+        self._cells = {}
+        self._built_at = None
+        self._built_for = None
+
+    def rebuild(self):
+        """Reload checked-in staff and open-complaint counts from the database"""
+        today = date.today()
+        present = db.session.query(
+            WorkforceEntry.staff_id, User.role,
+            WorkforceEntry.check_in_latitude, WorkforceEntry.check_in_longitude
+        ).join(User, WorkforceEntry.staff_id == User.id).filter(
+            WorkforceEntry.shift_date == today,
+            WorkforceEntry.check_in_time.isnot(None),
+            WorkforceEntry.check_out_time.is_(None),
+            User.is_active == True
+        ).all()
+        loads = dict(db.session.query(Complaint.assigned_to_id, func.count(Complaint.id)).filter(
+            Complaint.assigned_to_id.isnot(None),
+            Complaint.status.in_(OPEN_STATUSES)
+        ).group_by(Complaint.assigned_to_id).all())
+
+        staff = {row.staff_id: _Staff(row.staff_id, row.role, loads.get(row.staff_id, 0),
+                                      row.check_in_latitude, row.check_in_longitude)
+                 for row in present}
+        cells = {}
+        for member in staff.values():
+            if member.cell is not None:
+                cells.setdefault(member.cell, set()).add(member.staff_id)
+
+        with self._lock:
+            self._staff = staff
+            self._cells = cells
+            self._built_at = time.monotonic()
+            self._built_for = today
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_fresh(self):
+        if (self._built_at is None or self._built_for != date.today()
+                or time.monotonic() - self._built_at > REBUILD_SECONDS):
+            self.rebuild()
+
+    def _unlink(self, member):
+        if member.cell is not None:
+            members = self._cells.get(member.cell)
+            if members:
+                members.discard(member.staff_id)
+                if not members:
+                    del self._cells[member.cell]
+
+    def checked_in(self, staff_id, role, lat=None, lon=None):
+        self._ensure_fresh()
+        with self._lock:
+            previous = self._staff.get(staff_id)
+            if previous:
+                self._unlink(previous)
+            member = _Staff(staff_id, role, previous.load if previous else 0, lat, lon)
+            self._staff[staff_id] = member
+            if member.cell is not None:
+                self._cells.setdefault(member.cell, set()).add(staff_id)
+
+    def checked_out(self, staff_id):
+        with self._lock:
+            member = self._staff.pop(staff_id, None)
+            if member:
+                self._unlink(member)
+
+    def adjust_load(self, staff_id, delta):
+        """Record a complaint (delta=1) or its closure/reassignment (delta=-1)"""
+        if not staff_id:
+            return
+        with self._lock:
+            member = self._staff.get(staff_id)
+            if member:
+                member.load = max(0, member.load + delta)
+
+    def _score(self, member, lat, lon):
+        distance = haversine_km(lat, lon, member.lat, member.lon)
+        return distance + LOAD_PENALTY_KM * member.load
+
+    def _nearest(self, lat, lon, roles):
+        """Best located candidate by ring search outward from the complaint's cell"""
+        row0, col0 = _cell_key(lat, lon)
+        cell_km = CELL_DEGREES * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        best, best_score = None, None
+
+        for ring in range(MAX_RING + 1):
+            # Everything in this ring or beyond is at least this far away
+            if best is not None and best_score <= (ring - 1) * cell_km:
+                break
+            for cell in _ring_cells(row0, col0, ring):
+                for staff_id in self._cells.get(cell, ()):
+                    member = self._staff[staff_id]
+                    if roles and member.role not in roles:
+                        continue
+                    score = self._score(member, lat, lon)
+                    if best is None or score < best_score:
+                        best, best_score = member, score
+        return best
+
+    def assign(self, lat=None, lon=None, roles=('Staff',)):
+        """Pick the best checked-in assignee and count the complaint against them.
+
+        Prefers the lowest distance + load score near (lat, lon), falling back
+        to the least-loaded member. Returns a staff id, or None if nobody
+        suitable is checked in. Call adjust_load(id, -1) if the complaint is
+        not saved after all.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            best = self._nearest(lat, lon, roles) if lat is not None and lon is not None else None
+            if best is None:
+                candidates = [m for m in self._staff.values() if not roles or m.role in roles]
+                best = min(candidates, key=lambda m: (m.load, m.staff_id), default=None)
+            if best is None:
+                return None
+            best.load += 1
+            return best.staff_id
+
+assignment_engine = AssignmentEngine()
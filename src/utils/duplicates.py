@@ -0,0 +1,42 @@
+from src.models.user import db
+from src.models.complaint import Complaint
+from src.utils.sla import OPEN_STATUSES
+from datetime import datetime, timedelta
+import hashlib
+import re
+
+DUPLICATE_STATUS = 'Duplicate'
+# A matching report within this window joins the earlier complaint
+DUPLICATE_WINDOW_HOURS = 24
+# Subscriber numbers are the last 9 digits (07xx..., +2547xx..., 2547xx...)
+PHONE_DIGITS = 9
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-PHONE_DIGITS:]
+
+def complaint_fingerprint(phone, issue_type, geo_cell):
+    """Same customer, same fault type, same ~11 km grid cell (or no location).
+    None when the phone is too short to identify a customer: such complaints
+    are never treated as duplicates."""
+    customer = normalize_phone(phone)
+    if len(customer) < PHONE_DIGITS:
+        return None
+    key = '|'.join([customer, (issue_type or '').strip().lower(), geo_cell or ''])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def find_duplicate_parents(fingerprints, now=None):
+    """Map each fingerprint to the earliest open, non-duplicate complaint id
+    created within the window. One query served by ix_complaints_fingerprint_created."""
+    fingerprints = [fingerprint for fingerprint in fingerprints if fingerprint is not None]
+    if not fingerprints:
+        return {}
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=DUPLICATE_WINDOW_HOURS)
+    rows = db.session.query(Complaint.fingerprint, Complaint.id).filter(
+        Complaint.fingerprint.in_(fingerprints),
+        Complaint.created_at >= cutoff,
+        Complaint.duplicate_of_id.is_(None),
+        Complaint.status.in_(OPEN_STATUSES)
+    ).order_by(Complaint.created_at.desc()).all()
+    # Earlier rows overwrite later ones, leaving the original report
+    return dict(rows)
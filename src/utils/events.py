@@ -0,0 +1,115 @@
+from collections import deque
+from datetime import datetime
+import itertools
+import json
+import queue
+import threading
+
+# Events a client may fall behind by before it is told to resync
+CLIENT_BUFFER_SIZE = 100
+# Recent events kept so a reconnecting client can resume from Last-Event-ID
+REPLAY_SIZE = 500
+
+class Subscription:
+    """One connected client: a bounded queue of (id, type, data) events"""
+
+    def __init__(self):
+        self.events = queue.Queue(maxsize=CLIENT_BUFFER_SIZE)
+
+    def get(self, timeout):
+        """Next event, or None if nothing arrived within timeout seconds"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def offer(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # Too slow to keep up: drop what it has and ask it to refetch
+            self._drain()
+            self.events.put_nowait((event[0], 'resync', {}))
+
+    def _drain(self):
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return
+
+class EventBroker:
+    """In-process pub/sub for change events.
+
+    Only clients connected to this worker see its events; run the stream
+    endpoint on a single worker or put a shared broker behind publish().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=REPLAY_SIZE)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, last_event_id=None):
+        subscription = Subscription()
+        with self._lock:
+            if last_event_id is not None:
+                missed = [event for event in self._recent if event[0] > last_event_id]
+                if len(missed) > CLIENT_BUFFER_SIZE or (
+                        self._recent and self._recent[0][0] > last_event_id + 1):
+                    # Too much, or older than the replay buffer: refetch instead
+                    missed = [(self._recent[-1][0], 'resync', {})]
+                for event in missed:
+                    subscription.offer(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type, data):
+        """Send an event to every subscriber; call after the change is committed"""
+        with self._lock:
+            event = (next(self._ids), event_type, data)
+            self._recent.append(event)
+            for subscription in self._subscribers:
+                subscription.offer(event)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+broker = EventBroker()
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def format_sse(event):
+    event_id, event_type, data = event
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=_default)}\n\n'
+
+def complaint_event(complaint):
+    """Small summary of a complaint for change events; clients refetch for more"""
+    return {
+        'id': complaint.id,
+        'complaint_id': complaint.complaint_id,
+        'status': complaint.status,
+        'priority': complaint.priority,
+        'assigned_to_id': complaint.assigned_to_id,
+        'escalation_level': complaint.escalation_level,
+        'updated_at': complaint.updated_at,
+    }
+
+def attendance_event(entry):
+    return {
+        'id': entry.id,
+        'staff_id': entry.staff_id,
+        'shift_date': entry.shift_date.isoformat(),
+        'status': entry.status,
+        'check_in_time': entry.check_in_time.isoformat() if entry.check_in_time else None,
+        'check_out_time': entry.check_out_time.isoformat() if entry.check_out_time else None,
+    }
@@ -0,0 +1,14 @@
+def parse_fields(raw, allowed):
+    """Parse a ?fields=a,b,c sparse fieldset.
+
+    Returns None when no fieldset was requested, otherwise the list of field
+    names. Raises ValueError naming any field that is not in allowed.
+    """
+    if not raw:
+        return None
+
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(unknown)}')
+    return list(dict.fromkeys(fields)) or None
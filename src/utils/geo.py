@@ -0,0 +1,58 @@
+import math
+import re
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Grid cells of 0.1 x 0.1 degrees (about 11 km square near the equator)
+CELL_DEGREES = 0.1
+# Beyond this many cells a radius query uses a lat/lon range scan instead
+MAX_CELLS = 400
+
+_GPS_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*[,;\s]\s*(-?\d+(?:\.\d+)?)\s*$')
+
+def parse_gps(value):
+    """Parse a 'lat,lon' string into floats, or (None, None) if it is not one"""
+    if not value:
+        return None, None
+    match = _GPS_PATTERN.match(str(value))
+    if not match:
+        return None, None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    return lat, lon
+
+def grid_cell(lat, lon):
+    return f'{math.floor(lat / CELL_DEGREES)}:{math.floor(lon / CELL_DEGREES)}'
+
+def gps_columns(value):
+    """Numeric latitude/longitude and grid cell for a free-form GPS string"""
+    lat, lon = parse_gps(value)
+    return {
+        'latitude': lat,
+        'longitude': lon,
+        'geo_cell': grid_cell(lat, lon) if lat is not None else None
+    }
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the radius"""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+def cells_within(lat, lon, radius_km):
+    """Grid cells covering the radius, or None when there would be too many"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    rows = range(math.floor(min_lat / CELL_DEGREES), math.floor(max_lat / CELL_DEGREES) + 1)
+    cols = range(math.floor(min_lon / CELL_DEGREES), math.floor(max_lon / CELL_DEGREES) + 1)
+    if len(rows) * len(cols) > MAX_CELLS:
+        return None
+    return [f'{row}:{col}' for row in rows for col in cols]
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,52 @@
+from flask import request, session
+from sqlalchemy import func
+import gzip
+import hashlib
+
+def make_etag(*parts):
+    """Strong ETag value for a response built from the given version parts"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def collection_etag(query, updated_column):
+    """ETag for a filtered list: (max(updated_at), count) plus the request URL.
+
+    Costs one aggregate query and loads no ORM objects, so a 304 can be
+    answered before anything is loaded or serialized. The URL and user are
+    part of the tag so different pages, filters and users never share one.
+    Rows must bump updated_at when anything they render changes, including
+    child rows such as tasks or attachments, or the tag goes stale.
+    """
+    latest, count = query.order_by(None).with_entities(func.max(updated_column), func.count()).one()
+    return make_etag(request.full_path, session.get('user_id'), latest, count)
+
+def page_etag(items, *extra):
+    """ETag for one page of a list, from the (id, updated_at) of the rows it
+    returned plus anything else rendered with them, such as the next cursor.
+
+    Costs no query beyond loading the page itself, which suits cursor mode:
+    an aggregate over the whole filtered set would cost as much as the COUNT
+    that cursor pagination avoids.
+    """
+    versions = [(item.id, item.updated_at) for item in items]
+    return make_etag(request.full_path, session.get('user_id'), versions, *extra)
+
+def row_etag(updated_at):
+    return make_etag(request.full_path, updated_at)
+
+def is_not_modified(etag):
+    return request.if_none_match.contains(etag)
+
+def not_modified_response(etag):
+    return '', 304, {'ETag': f'"{etag}"'}
+
+def gzip_response(response, min_size=1024):
+    """Compress a large response body for clients that accept gzip"""
+    if 'gzip' not in request.accept_encodings or response.direct_passthrough:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,74 @@
+from sqlalchemy import and_, or_
+from datetime import datetime
+import base64
+import json
+
+MAX_CURSOR_LIMIT = 500
+
+def encode_cursor(values):
+    """Encode the sort key of the last row as an opaque URL-safe token"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(token, columns):
+    """Decode a cursor token back into typed values for the given sort columns"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise ValueError('Invalid cursor')
+
+    return [_cursor_value(column, value) for column, value in zip(columns, payload)]
+
+def _cursor_value(column, value):
+    """Check one decoded value against its column's Python type, so a forged
+    cursor is a 400 rather than a bad comparison in the database"""
+    expected = column.type.python_type
+    if expected is datetime:
+        if not isinstance(value, str):
+            raise ValueError('Invalid cursor')
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError('Invalid cursor')
+    # bool is an int subclass, but never a valid sort key
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise ValueError('Invalid cursor')
+    return value
+
+def keyset_filter(columns, values, descending=False):
+    """Build the (a, b, ...) > (x, y, ...) seek predicate portably"""
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        seek = column < value if descending else column > value
+        equal_prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, seek))
+    return or_(*clauses)
+
+def clamp_limit(limit):
+    """The page size keyset_paginate() actually uses for a requested limit"""
+    return max(1, min(limit, MAX_CURSOR_LIMIT))
+
+def keyset_paginate(query, columns, sort_key, cursor=None, limit=20, descending=False, with_total=False):
+    """Seek-based pagination ordered on columns, the last of which must be unique.
+
+    sort_key maps a result row to its values for columns. Returns
+    (items, next_cursor, total) where total is None unless requested.
+    """
+    limit = clamp_limit(limit)
+    total = query.order_by(None).count() if with_total else None
+
+    if cursor:
+        query = query.filter(keyset_filter(columns, decode_cursor(cursor, columns), descending))
+
+    ordering = [c.desc() for c in columns] if descending else [c.asc() for c in columns]
+    rows = query.order_by(None).order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort_key(rows[-1]))
+    return rows, next_cursor, total
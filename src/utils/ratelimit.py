@@ -0,0 +1,149 @@
+from collections import namedtuple
+from flask import current_app, jsonify, request
+import math
+import threading
+import time
+
+# count requests per period seconds, keyed by client IP ('ip') or by what the
+# request targets ('target', see rate_limit_target)
+Limit = namedtuple('Limit', ['count', 'period', 'scope'])
+
+# Endpoint or blueprint name -> limits; override with app.config['RATE_LIMITS']
+DEFAULT_RATE_LIMITS = {
+    # Password hashing is deliberately slow
+    'auth.login': [Limit(10, 60, 'ip'), Limit(5, 300, 'target')],
+    # The only unauthenticated write
+    'complaints.submit_feedback': [Limit(20, 60, 'ip'), Limit(5, 3600, 'target')],
+}
+
+class MemoryBackend:
+    """Token buckets in this process; each worker limits on its own"""
+
+    # Above this many buckets, forget the ones that have refilled completely
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, capacity, refill_rate):
+        """Take one token; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now)
+        return retry_after
+
+    def _prune(self, now):
+        # A bucket that has refilled behaves exactly like a missing one
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+class RedisBackend:
+    """Token buckets shared by every worker, kept in Redis.
+
+    Needs the redis package; client is a redis.Redis instance.
+    """
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self._script = client.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RATELIMIT_STORAGE_URL is set but the redis package is not installed')
+        return cls(redis.Redis.from_url(url))
+
+    def consume(self, key, capacity, refill_rate):
+        return float(self._script(keys=[self._prefix + key], args=[capacity, refill_rate, time.time()]))
+
+def rate_limit_target(key_func):
+    """Decorate a view with how to find what a request targets, e.g. the
+    staff number being logged into. Defaults to the URL arguments."""
+    def decorator(f):
+        f.rate_limit_target = key_func
+        return f
+    return decorator
+
+class RateLimiter:
+    """Rejects requests over their RATE_LIMITS with 429 before the view runs.
+
+    Runs as a before_request hook, so no database or password work is done
+    for a rejected request. Behind a reverse proxy, wrap the app in
+    werkzeug's ProxyFix so request.remote_addr is the client's address.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMITS', DEFAULT_RATE_LIMITS)
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        if self.backend is None:
+            url = app.config.get('RATELIMIT_STORAGE_URL')
+            self.backend = RedisBackend.from_url(url) if url else MemoryBackend()
+        app.before_request(self.check)
+
+    def _limits(self):
+        limits = current_app.config['RATE_LIMITS']
+        return limits.get(request.endpoint) or limits.get(request.blueprint) or ()
+
+    def _target(self):
+        view = current_app.view_functions.get(request.endpoint)
+        key_func = getattr(view, 'rate_limit_target', None)
+        if key_func:
+            return key_func()
+        return ','.join(f'{name}={value}' for name, value in sorted((request.view_args or {}).items()))
+
+    def check(self):
+        if not current_app.config['RATELIMIT_ENABLED'] or request.method == 'OPTIONS':
+            return None
+        limits = self._limits()
+        if not limits:
+            return None
+
+        retry_after = 0
+        for limit in limits:
+            subject = request.remote_addr if limit.scope == 'ip' else self._target()
+            if subject is None:
+                continue
+            key = f'{request.endpoint}:{limit.scope}:{limit.count}/{limit.period}:{subject}'
+            retry_after = max(retry_after, self.backend.consume(key, limit.count, limit.count / limit.period))
+
+        if retry_after:
+            response = jsonify({'error': 'Too many requests, please try again later'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
+        return None
+
+limiter = RateLimiter()
@@ -0,0 +1,239 @@
+from src.models.user import db
+from src.models.complaint import Complaint
+from src.models.complaint_rollup import ComplaintDailyRollup, rebuild_rollup_days
+from src.utils.duplicates import complaint_fingerprint
+from src.utils.geo import gps_columns, parse_gps
+from src.utils.search import install_search_index
+from sqlalchemy import func, inspect, text
+import json
+
+def _add_missing_columns(conn, table, existing):
+    messages = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        # Added columns are always nullable: existing rows have no value yet
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        messages.append(f'Added column {table.name}.{column.name}')
+    return messages
+
+def _has_duplicates(conn, index):
+    columns = list(index.columns)
+    duplicates = conn.execute(
+        db.select(*columns).group_by(*columns).having(func.count() > 1).limit(1)
+    ).first()
+    return duplicates is not None
+
+def _create_missing_indexes(conn, table, existing):
+    messages = []
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        if index.unique and _has_duplicates(conn, index):
+            messages.append(
+                f'Skipped unique index {index.name}: duplicate '
+                f'({", ".join(c.name for c in index.columns)}) rows must be merged first'
+            )
+            continue
+        index.create(conn)
+        messages.append(f'Created index {index.name}')
+    return messages
+
+def _merge_duplicate_entries(conn):
+    """Fold duplicate (staff_id, shift_date) workforce entries into the oldest
+    one so the unique index can be built: earliest check-in, latest check-out,
+    and any field the kept row is missing"""
+    from src.models.workforce import WorkforceEntry
+    
+    table = WorkforceEntry.__table__
+    groups = conn.execute(
+        db.select(table.c.staff_id, table.c.shift_date)
+        .group_by(table.c.staff_id, table.c.shift_date).having(func.count() > 1)
+    ).all()
+    removed = 0
+    for staff_id, shift_date in groups:
+        rows = conn.execute(
+            db.select(table).where(table.c.staff_id == staff_id, table.c.shift_date == shift_date)
+            .order_by(table.c.id)
+        ).mappings().all()
+        kept = dict(rows[0])
+        for row in rows[1:]:
+            for column, value in row.items():
+                if kept[column] is None:
+                    kept[column] = value
+        
+        check_ins = [row for row in rows if row['check_in_time'] is not None]
+        if check_ins:
+            first = min(check_ins, key=lambda row: row['check_in_time'])
+            for column in ('check_in_time', 'check_in_location', 'check_in_gps',
+                           'check_in_latitude', 'check_in_longitude', 'status'):
+                kept[column] = first[column]
+        check_outs = [row for row in rows if row['check_out_time'] is not None]
+        if check_outs:
+            last = max(check_outs, key=lambda row: row['check_out_time'])
+            for column in ('check_out_time', 'check_out_location', 'check_out_gps'):
+                kept[column] = last[column]
+        # Recomputed by backfill_minutes_worked()
+        kept['minutes_worked'] = None
+        
+        kept_id = kept.pop('id')
+        conn.execute(table.update().where(table.c.id == kept_id).values(**kept))
+        conn.execute(table.delete().where(table.c.id.in_([row['id'] for row in rows[1:]])))
+        removed += len(rows) - 1
+    return removed
+
+def _backfill_coordinates(conn, batch_size=1000):
+    """Parse GPS strings saved before the numeric location columns existed"""
+    from src.models.workforce import WorkforceEntry
+    
+    updated = 0
+    targets = [
+        (Complaint, 'gps_coordinates', Complaint.latitude, gps_columns),
+        (WorkforceEntry, 'check_in_gps', WorkforceEntry.check_in_latitude,
+         lambda value: dict(zip(('check_in_latitude', 'check_in_longitude'), parse_gps(value)))),
+        (WorkforceEntry, 'work_area_gps', WorkforceEntry.work_area_latitude,
+         lambda value: dict(zip(('work_area_latitude', 'work_area_longitude'), parse_gps(value)))),
+    ]
+    for model, source, parsed_column, parse in targets:
+        table = model.__table__
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                db.select(table.c.id, table.c[source])
+                .where(table.c.id > last_id, table.c[source].isnot(None), parsed_column.is_(None))
+                .order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                values = parse(row[1])
+                if any(value is not None for value in values.values()):
+                    conn.execute(table.update().where(table.c.id == row.id).values(**values))
+                    updated += 1
+            last_id = rows[-1].id
+    return updated
+
+def _backfill_fingerprints(conn, batch_size=1000):
+    """Fingerprint complaints saved before duplicate detection existed"""
+    table = Complaint.__table__
+    updated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            db.select(table.c.id, table.c.customer_phone, table.c.issue_type, table.c.geo_cell)
+            .where(table.c.id > last_id, table.c.fingerprint.is_(None))
+            .order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            conn.execute(table.update().where(table.c.id == row.id).values(
+                fingerprint=complaint_fingerprint(row.customer_phone, row.issue_type, row.geo_cell)
+            ))
+        updated += len(rows)
+        last_id = rows[-1].id
+    return updated
+
+def _migrate_task_lists(conn, batch_size=1000):
+    """Move the legacy assigned_tasks/completed_tasks JSON arrays into
+    workforce_tasks rows, clearing each entry's arrays as it goes"""
+    from src.models.workforce import WorkforceEntry
+    from src.models.workforce_task import TASK_COMPLETED, TASK_PENDING, WorkforceTask, task_text
+    
+    table = WorkforceEntry.__table__
+    migrated = 0
+    while True:
+        rows = conn.execute(
+            db.select(table.c.id, table.c.assigned_tasks, table.c.completed_tasks,
+                      table.c.created_at, table.c.updated_at)
+            .where(db.or_(table.c.assigned_tasks.isnot(None), table.c.completed_tasks.isnot(None)))
+            .order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        tasks = []
+        for row in rows:
+            assigned = [task_text(task) for task in json.loads(row.assigned_tasks or '[]')]
+            completed = {task_text(task) for task in json.loads(row.completed_tasks or '[]')}
+            # Completed tasks that were never assigned still belong to the shift
+            assigned.extend(task for task in sorted(completed) if task not in assigned)
+            for task in assigned:
+                done = task in completed
+                tasks.append({
+                    'entry_id': row.id,
+                    'task': task,
+                    'status': TASK_COMPLETED if done else TASK_PENDING,
+                    'created_at': row.created_at,
+                    # The arrays kept no times; the entry's last update is the best guess
+                    'completed_at': row.updated_at if done else None
+                })
+        if tasks:
+            conn.execute(WorkforceTask.__table__.insert(), tasks)
+        conn.execute(
+            table.update().where(table.c.id.in_([row.id for row in rows]))
+            .values(assigned_tasks=None, completed_tasks=None)
+        )
+        migrated += len(tasks)
+    return migrated
+
+def backfill_minutes_worked(conn):
+    """Store minutes_worked for completed shifts saved before it existed"""
+    from src.models.workforce import WorkforceEntry
+    
+    table = WorkforceEntry.__table__
+    result = conn.execute(
+        table.update()
+        .where(table.c.minutes_worked.is_(None),
+               table.c.check_in_time.isnot(None),
+               table.c.check_out_time.isnot(None))
+        .values(minutes_worked=WorkforceEntry.minutes_worked_expression())
+    )
+    return result.rowcount
+
+def upgrade_database():
+    """Bring an existing database up to the current models.
+
+    db.create_all() only creates missing tables. This also adds new columns
+    and indexes to tables that already exist. Returns a list of messages.
+    """
+    db.create_all()
+    messages = []
+
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in db.metadata.sorted_tables:
+            columns = {c['name'] for c in inspector.get_columns(table.name)}
+            messages.extend(_add_missing_columns(conn, table, columns))
+
+            indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            if table.name == 'workforce_entries' and 'uq_workforce_entries_staff_date' not in indexes:
+                removed = _merge_duplicate_entries(conn)
+                if removed:
+                    messages.append(f'Merged {removed} duplicate workforce entry row(s)')
+            messages.extend(_create_missing_indexes(conn, table, indexes))
+
+        # Backfill the reporting rollup the first time it appears
+        rollup_empty = conn.execute(db.select(ComplaintDailyRollup.day).limit(1)).first() is None
+        if rollup_empty and conn.execute(db.select(Complaint.id).limit(1)).first() is not None:
+            rebuild_rollup_days(conn)
+            messages.append('Backfilled complaint_daily_rollup')
+
+        updated = _backfill_coordinates(conn)
+        if updated:
+            messages.append(f'Parsed GPS coordinates for {updated} row(s)')
+
+        updated = backfill_minutes_worked(conn)
+        if updated:
+            messages.append(f'Stored minutes_worked for {updated} completed shift(s)')
+
+        updated = _backfill_fingerprints(conn)
+        if updated:
+            messages.append(f'Fingerprinted {updated} complaint(s) for duplicate detection')
+
+        migrated = _migrate_task_lists(conn)
+        if migrated:
+            messages.append(f'Moved {migrated} task(s) into workforce_tasks')
+
+    install_search_index(db.engine)
+    return messages
@@ -0,0 +1,96 @@
+from src.models.user import db
+from src.models.complaint import Complaint
+from sqlalchemy import column, false, func, literal_column, table, text
+import re
+
+# Complaint IDs look like 2025-0001 (and keep growing past 9999)
+COMPLAINT_ID_PATTERN = re.compile(r'^\d{4}-\d{4,}$')
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5(
+        complaint_id, customer_name, description,
+        content='complaints', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS complaints_fts_ai AFTER INSERT ON complaints BEGIN
+        INSERT INTO complaints_fts(rowid, complaint_id, customer_name, description)
+        VALUES (new.id, new.complaint_id, new.customer_name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS complaints_fts_ad AFTER DELETE ON complaints BEGIN
+        INSERT INTO complaints_fts(complaints_fts, rowid, complaint_id, customer_name, description)
+        VALUES ('delete', old.id, old.complaint_id, old.customer_name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS complaints_fts_au
+    AFTER UPDATE OF complaint_id, customer_name, description ON complaints BEGIN
+        INSERT INTO complaints_fts(complaints_fts, rowid, complaint_id, customer_name, description)
+        VALUES ('delete', old.id, old.complaint_id, old.customer_name, old.description);
+        INSERT INTO complaints_fts(rowid, complaint_id, customer_name, description)
+        VALUES (new.id, new.complaint_id, new.customer_name, new.description);
+    END""",
+]
+
+POSTGRES_SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(complaint_id, '') || ' ' || "
+    "coalesce(customer_name, '') || ' ' || coalesce(description, ''))"
+)
+
+POSTGRES_SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_complaints_search ON complaints USING GIN ({POSTGRES_SEARCH_DOCUMENT})",
+]
+
+complaints_fts = table('complaints_fts', column('rowid'))
+
+def install_search_index(engine):
+    """Create the full-text index for complaints if it does not exist yet"""
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'complaints_fts'"
+            )).first()
+            for statement in SQLITE_SEARCH_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                # Index rows that were inserted before the triggers existed
+                conn.execute(text("INSERT INTO complaints_fts(complaints_fts) VALUES ('rebuild')"))
+        elif engine.dialect.name == 'postgresql':
+            for statement in POSTGRES_SEARCH_DDL:
+                conn.execute(text(statement))
+
+def _search_terms(search):
+    return re.findall(r'\w+', search)
+
+def apply_search(query, search):
+    """Filter a Complaint query by a free-text search.
+
+    Returns (query, rank) where rank is an ORDER BY expression putting the
+    best matches first, or None when results carry no relevance order.
+    """
+    search = search.strip()
+    if COMPLAINT_ID_PATTERN.match(search):
+        return query.filter(Complaint.complaint_id == search), None
+
+    terms = _search_terms(search)
+    if not terms:
+        return query.filter(false()), None
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        match = ' '.join('"%s"*' % term for term in terms)
+        hits = db.session.query(
+            complaints_fts.c.rowid.label('complaint_pk'),
+            func.bm25(literal_column('complaints_fts')).label('rank')
+        ).filter(text('complaints_fts MATCH :match').bindparams(match=match)).subquery()
+        query = query.join(hits, hits.c.complaint_pk == Complaint.id)
+        return query, hits.c.rank.asc()
+
+    if dialect == 'postgresql':
+        document = literal_column(POSTGRES_SEARCH_DOCUMENT)
+        tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        query = query.filter(document.op('@@')(tsquery))
+        return query, func.ts_rank(document, tsquery).desc()
+
+    # No full-text support on this backend, fall back to substring matching
+    return query.filter(
+        (Complaint.customer_name.contains(search)) |
+        (Complaint.complaint_id.contains(search)) |
+        (Complaint.description.contains(search))
+    ), None
@@ -0,0 +1,139 @@
+from src.models.user import User, db
+from src.models.complaint import Complaint
+from src.utils.events import broker
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Complaints open longer than this without escalation breach the SLA
+SLA_HOURS = 48
+OPEN_STATUSES = ['Open', 'In Progress']
+
+# Who picks up a complaint at each escalation level
+ESCALATION_ROLES = {1: 'Supervisor', 2: 'Admin'}
+MAX_ESCALATION_LEVEL = max(ESCALATION_ROLES)
+
+TARGET_CACHE_SECONDS = 300
+_target_cache = {}
+_target_lock = threading.Lock()
+
+def escalation_target_id(level):
+    """User id that complaints escalated to level are assigned to, cached briefly"""
+    role = ESCALATION_ROLES.get(level)
+    if role is None:
+        return None
+
+    now = time.monotonic()
+    with _target_lock:
+        cached = _target_cache.get(role)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    user_id = db.session.query(User.id).filter_by(role=role, is_active=True).order_by(User.id).scalar()
+    with _target_lock:
+        _target_cache[role] = (user_id, now + TARGET_CACHE_SECONDS)
+    return user_id
+
+def sweep_overdue_complaints(batch_size=500, now=None):
+    """Escalate open complaints past the SLA to level 1, one batch at a time.
+
+    Each complaint goes to the nearest, least-loaded checked-in supervisor,
+    or to escalation_target_id(1) when none is checked in, with one UPDATE
+    per assignee in the batch. Returns the number of complaints escalated.
+    """
+    # Imported here: the assignment engine imports OPEN_STATUSES from this module
+    from src.utils.assignment import assignment_engine
+
+    now = now or datetime.utcnow()
+    cutoff_time = now - timedelta(hours=SLA_HOURS)
+    roles = (ESCALATION_ROLES[1],)
+    fallback_id = escalation_target_id(1)
+    escalated = 0
+
+    while True:
+        # Served by ix_complaints_status_escalation_created
+        rows = db.session.query(
+            Complaint.id, Complaint.latitude, Complaint.longitude, Complaint.assigned_to_id
+        ).filter(
+            Complaint.status.in_(OPEN_STATUSES),
+            Complaint.escalation_level == 0,
+            Complaint.created_at < cutoff_time
+        ).limit(batch_size).all()
+        if not rows:
+            break
+
+        # assign() counts each pick against the supervisor, spreading the batch
+        by_assignee = {}
+        for row in rows:
+            assignee_id = assignment_engine.assign(row.latitude, row.longitude, roles=roles)
+            if assignee_id is None:
+                assignee_id = fallback_id
+                assignment_engine.adjust_load(assignee_id, 1)
+            by_assignee.setdefault(assignee_id, []).append(row)
+
+        batches = []
+        skipped = False
+        for assignee_id, batch in by_assignee.items():
+            ids = [row.id for row in batch]
+            values = {'escalation_level': 1, 'escalated_at': now, 'overdue_at': now}
+            if assignee_id:
+                values['assigned_to_id'] = assignee_id
+            result = db.session.execute(
+                db.update(Complaint)
+                .where(Complaint.id.in_(ids), Complaint.escalation_level == 0)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            escalated += result.rowcount
+            skipped = skipped or result.rowcount != len(ids)
+            batches.append((assignee_id, batch, ids, values))
+        db.session.commit()
+
+        if skipped:
+            # Someone escalated part of the batch first; the counted picks are off
+            assignment_engine.invalidate()
+        for assignee_id, batch, ids, values in batches:
+            if assignee_id and not skipped:
+                for row in batch:
+                    assignment_engine.adjust_load(row.assigned_to_id, -1)
+            broker.publish('complaints.bulk_updated', {'ids': ids, 'changes': values})
+
+    return escalated
+
+def run_sweeper(app, interval):
+    """Sweep forever every interval seconds; meant for a worker thread or CLI loop"""
+    while True:
+        try:
+            with app.app_context():
+                count = sweep_overdue_complaints()
+                if count:
+                    logger.info('Escalated %d overdue complaint(s)', count)
+        except Exception:
+            logger.exception('SLA sweep failed')
+        time.sleep(interval)
+
+def start_sweeper_thread(app, interval):
+    thread = threading.Thread(target=run_sweeper, args=(app, interval), name='sla-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+def init_sweeper(app):
+    """Start the sweeper thread with the app's first request, every
+    SLA_SWEEPER_INTERVAL seconds (0 disables it). CLI commands such as
+    upgrade-db never start it."""
+    interval = app.config.get('SLA_SWEEPER_INTERVAL', 0)
+    if not interval:
+        return
+    lock = threading.Lock()
+    started = []
+
+    @app.before_request
+    def _start_sweeper():
+        if started:
+            return
+        with lock:
+            if not started:
+                started.append(start_sweeper_thread(app, interval))
@@ -0,0 +1,36 @@
+from src.models.user import db
+from sqlalchemy import Float, case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+def dialect_insert(table, bind=None):
+    """INSERT construct with ON CONFLICT support for the active database"""
+    dialect = (bind or db.session.get_bind()).dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f'Upserts are not supported on {dialect}')
+
+def count_if(condition):
+    """SUM(CASE WHEN condition THEN 1 ELSE 0 END) for conditional aggregation"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+class epoch_seconds(FunctionElement):
+    """A DATETIME or TIME value as seconds on a common scale.
+
+    Only differences between two values are meaningful, which is all the
+    duration calculations need, and those are portable across backends.
+    """
+    type = Float()
+    name = 'epoch_seconds'
+    inherit_cache = True
+
+@compiles(epoch_seconds)
+def _epoch_seconds_default(element, compiler, **kw):
+    return 'EXTRACT(EPOCH FROM %s)' % compiler.process(element.clauses, **kw)
+
+@compiles(epoch_seconds, 'sqlite')
+def _epoch_seconds_sqlite(element, compiler, **kw):
+    return '((julianday(%s) - 2440587.5) * 86400.0)' % compiler.process(element.clauses, **kw)
@@ -0,0 +1,53 @@
+from flask import current_app
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+class FileTooLarge(ValueError):
+    pass
+
+def storage_root():
+    return current_app.config['ATTACHMENT_STORAGE_PATH']
+
+def blob_path(sha256):
+    """Content-addressed location: <root>/ab/cd/abcd..."""
+    return os.path.join(storage_root(), sha256[:2], sha256[2:4], sha256)
+
+def store_stream(stream, max_bytes):
+    """Copy a stream into storage chunk by chunk, hashing as it goes.
+
+    The whole file is never held in memory. Identical content is stored once.
+    Returns (sha256, size). Raises FileTooLarge past max_bytes.
+    """
+    incoming = os.path.join(storage_root(), 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+    
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=incoming)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLarge(f'Attachment exceeds {max_bytes} bytes')
+                digest.update(chunk)
+                temp_file.write(chunk)
+        
+        sha256 = digest.hexdigest()
+        final_path = blob_path(sha256)
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+        return sha256, size
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise